@@ -1,12 +1,21 @@
 import os
-import glob
+import base64
+import hashlib
+import pickle
+from itertools import islice
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
 from typing import TypedDict, Annotated, Sequence
 import uuid
+import chromadb
 from dotenv import load_dotenv
 from langgraph.graph.message import add_messages
-from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, ToolMessage
+from langchain_core.documents import Document
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_openai import ChatOpenAI
+from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.vectorstores import Chroma
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -19,103 +28,451 @@ load_dotenv()
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
 
+
+def _load_one_pdf(pdf_file):
+    """Load a single PDF file. Runs in a worker process, so it has to live at module level."""
+    try:
+        loader = PyPDFLoader(pdf_file)        # PyPDFLoader only extracts text from pdf file
+        return loader.load()
+    except Exception as e:
+        print(f"Error loading PDF {pdf_file}: {e}")
+        raise
+
+def _file_hash(path):
+    """SHA-256 of a file's bytes, used to recognise PDFs that were already processed."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# Built once at import (and so once per worker process) rather than on every split
+_TEXT_SPLITTER = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+def _split_one(text):
+    """Split a single page of text. Runs in a worker process, so it has to live at module level."""
+    return _TEXT_SPLITTER.split_text(text)
+
 class DrugTreatmentRAGAgent:
     def __init__(self):
-        self.db_name = "drug_treatment_db"
+        self.db_name = "drug_treatment_minilm_db"
         self.collection_name = "drug_treatment_docs"
         self.folder_path = "drug-knowledge-base"
         self.llm_with_tools = None
         self.max_retrieval_docs = 5
+        self.ingest_batch_size = 1000       # rows per Chroma insert
+        self.hnsw_m = 32                    # graph links per node
+        self.hnsw_construction_ef = 200     # candidate list size while building the graph
+        self.hnsw_search_ef = 64            # candidate list size per query; must stay >= max_retrieval_docs
+        self.compress_documents = False     # store chunk text zstd-compressed in Chroma (needs the zstandard package)
+        self.chunk_cache_dir = "drug_treatment_chunk_cache"     # split + embedded chunks per PDF, keyed by content hash
+        self.use_quantized_index = False    # store vectors in a FAISS IVF-PQ index instead of Chroma's float32 HNSW
+        self.faiss_index_path = "drug_treatment_minilm_faiss"
+        self.faiss_train_size = 10000       # embeddings used to train the IVF-PQ quantizers
+        self.faiss_quantization = "pq"      # "pq": IVF-PQ codes; "int8": 8-bit scalar quantization (384 bytes, higher recall)
+        self.pq_subquantizers = 64          # 384 dims / 64 = 6 dims per 8-bit code -> 64 bytes per vector
+        self.vectorstore = None
         self.retriever = None
+        self.retrieval_cache = OrderedDict()     # normalized query -> formatted retriever_tool result
+        self.retrieval_cache_size = 1024
         self.memory = MemorySaver()
         self.thread_id = str(uuid.uuid4())
+        self.stream_answers = True          # print answer tokens as they arrive; False waits for the full response
         self.tools = None
-        self.embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+        # Imported here rather than at module level: the spawned PDF-loading and splitting workers
+        # re-import this module and never need torch
+        import torch
+
+        # Local 384-dim sentence-transformer: no API round-trip per embedding and a 4x smaller index than text-embedding-3-small
+        self.embedding_model = "sentence-transformers/all-MiniLM-L6-v2"
+        self.embeddings = HuggingFaceEmbeddings(
+            model_name=self.embedding_model,
+            model_kwargs={"device": "cuda" if torch.cuda.is_available() else "cpu"},
+            encode_kwargs={"batch_size": 128, "normalize_embeddings": True},
+        )
         self.rag_agent_graph = None
+        self._chroma_client = None
+        self._decompressor = None
         
         
-    def load_documents(self):
+    def _list_pdfs(self):
+        """List every PDF file in the knowledge base folder."""
+        if not os.path.exists(self.folder_path):
+            raise FileNotFoundError(f"Knowledge base folder not found: {self.folder_path}")
+
+        # Walk with scandir: directory entries carry their file type, so no extra stat call per entry as with glob
+        pdf_files = []
+        stack = [self.folder_path]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith(".pdf"):
+                        pdf_files.append(entry.path)
+        return pdf_files
+
+    def load_documents(self, pdf_files):
         """
-        Load PDF documents from the specified directory using PyPDFDirectoryLoader.
+        Load PDF documents using PyPDFLoader.
 
-        Returns:
-        List of Document objects: Loaded PDF documents represented as Langchain Document objects.
+        Args:
+            pdf_files: List of PDF file paths to load.
+
+        Yields:
+        List of Document objects: The pages of one PDF file at a time, in the order of `pdf_files`, so callers never hold the whole corpus.
         """
         
-        if not os.path.exists(self.folder_path):
-            raise FileNotFoundError(f"Knowledge base folder not found: {self.folder_path}")
+        page_count = 0
+        workers = os.cpu_count()
 
-        documents = []
-        pdf_files = glob.glob(os.path.join(self.folder_path, "**", "*.pdf"), recursive=True)
-        for pdf_file in pdf_files:
-            try:
-                loader = PyPDFLoader(pdf_file)        # PyPDFLoader only extracts text from pdf file
-                documents.extend(loader.load())
-            except Exception as e:
-                print(f"Error loading PDF {pdf_file}: {e}")
-                raise
+        # PDF parsing is CPU-bound, so spread the files across processes. executor.map would
+        # submit every file up front and buffer all parsed pages while the caller is still
+        # embedding the first file, so keep only a window of files in flight and submit the
+        # next one as the oldest is handed over. Spawned for the same reason as the split pool.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as executor:
+            remaining = iter(pdf_files)
+            pending = deque(executor.submit(_load_one_pdf, pdf_file) for pdf_file in islice(remaining, workers))
+            while pending:
+                pages = pending.popleft().result()
+                next_file = next(remaining, None)
+                if next_file is not None:
+                    pending.append(executor.submit(_load_one_pdf, next_file))
+                page_count += len(pages)
+                yield pages
 
-        print(f"Found {len(documents)} pages in {len(pdf_files)} PDF documents")
-        return documents
+        print(f"Found {page_count} pages in {len(pdf_files)} PDF documents")
 
-    def split_documents(self, documents):
+    def split_documents(self, documents, pool=None):
         """
         Split the text content of the given list of Document objects into smaller chunks.
 
         Args:
             documents: List of Document objects containing text content to split.
+            pool: Optional multiprocessing pool to split the pages on; pages are split in this process without one.
 
         Returns:
             List of Document objects representing the split text chunks.
         """
         
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        chunks = text_splitter.split_documents(documents)
-        print(f"{len(chunks)} Chunks created")
+        # Splitting is pure-Python and CPU-bound, so split pages in parallel and reattach their metadata
+        texts = [doc.page_content for doc in documents]
+        pieces_per_doc = pool.imap(_split_one, texts, chunksize=16) if pool is not None else map(_split_one, texts)
+        chunks = []
+        for doc, pieces in zip(documents, pieces_per_doc):
+            chunks.extend(Document(page_content=piece, metadata=dict(doc.metadata)) for piece in pieces)
         return chunks
-    
-    def save_to_vector_store(self, chunks):
+
+    def _embedded_chunks(self, pdf_files, file_hashes):
+        """
+        Produce the split and embedded chunks of each PDF, one file at a time.
+
+        Results are cached on disk under the SHA-256 of the PDF's bytes, so a file that has
+        been processed before skips the load -> split -> embed pipeline entirely. The cache is
+        kept per embedding model and splitter settings, so changing either recomputes the chunks.
+        Files that yield no chunks are not cached, so they are retried on the next run.
+
+        Args:
+            pdf_files: List of PDF file paths.
+            file_hashes: Mapping of PDF file path to its SHA-256 hex digest.
+
+        Yields:
+        Tuple of (chunks, embeddings) for one PDF file.
+        """
+        cache_dir = os.path.join(
+            self.chunk_cache_dir, f"{self.embedding_model.replace('/', '--')}_size{CHUNK_SIZE}_overlap{CHUNK_OVERLAP}"
+        )
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_paths = {pdf_file: os.path.join(cache_dir, f"{file_hashes[pdf_file]}.pkl") for pdf_file in pdf_files}
+
+        uncached = []
+        for pdf_file in pdf_files:
+            if os.path.exists(cache_paths[pdf_file]):
+                with open(cache_paths[pdf_file], "rb") as f:
+                    yield pickle.load(f)
+            else:
+                uncached.append(pdf_file)
+
+        if not uncached:
+            return
+
+        # Spawned, not forked, so workers don't inherit the loaded embedding model and torch's thread pools;
+        # the pool only lives for this ingestion
+        with get_context("spawn").Pool(os.cpu_count()) as split_pool:
+            # Iterate the generator itself, so it runs to the end and reports its page count
+            for index, pages in enumerate(self.load_documents(uncached)):
+                pdf_file = uncached[index]
+                chunks = self.split_documents(pages, pool=split_pool)
+                for chunk in chunks:
+                    chunk.metadata["file_hash"] = file_hashes[pdf_file]
+                if not chunks:
+                    print(f"No text extracted from {pdf_file}")
+                    continue
+                embeddings = self.embeddings.embed_documents([chunk.page_content for chunk in chunks])
+                with open(cache_paths[pdf_file], "wb") as f:
+                    pickle.dump((chunks, embeddings), f)
+                yield chunks, embeddings
+
+    def _add_chunks(self, vectorstore, chunks, embeddings):
+        """Insert already-embedded chunks into the collection in batches of `ingest_batch_size`."""
+        if self.compress_documents:
+            import zstandard as zstd
+            compressor = zstd.ZstdCompressor(level=3)
+
+        for start in range(0, len(chunks), self.ingest_batch_size):
+            batch = chunks[start:start + self.ingest_batch_size]
+            if self.compress_documents:
+                # Chroma documents must be strings, so the compressed bytes are stored base64-encoded
+                documents = [base64.b64encode(compressor.compress(chunk.page_content.encode())).decode() for chunk in batch]
+                metadatas = [{**chunk.metadata, "z": 1} for chunk in batch]
+            else:
+                documents = [chunk.page_content for chunk in batch]
+                metadatas = [chunk.metadata for chunk in batch]
+            vectorstore._collection.add(
+                ids=[str(uuid.uuid4()) for _ in batch],
+                embeddings=embeddings[start:start + self.ingest_batch_size],
+                metadatas=metadatas,
+                documents=documents,
+            )
+
+    def save_to_vector_store(self, pdf_files):
         """
-        Save the split text chunks to a vector store.
+        Save the chunks of the given PDF files to a new vector store.
+
+        Files are processed one at a time, so memory use stays flat regardless of how large
+        the knowledge base is.
 
         Args:
-            chunks: List of Document objects representing the split text chunks.
+            pdf_files: List of PDF file paths.
         """
         
-        if os.path.exists(self.db_name):
-            Chroma(persist_directory=self.db_name, embedding_function=self.embeddings).delete_collection()
+        client = self._get_chroma_client()
+        if self.collection_name in [collection.name for collection in client.list_collections()]:
+            client.delete_collection(self.collection_name)
 
-        vectorstore = Chroma.from_documents(
-            documents=chunks,
-            embedding=self.embeddings,
-            persist_directory=self.db_name,
+        vectorstore = Chroma(
+            client=client,
+            embedding_function=self.embeddings,
             collection_name=self.collection_name,
+            collection_metadata=self._collection_metadata(),
         )
+
+        file_hashes = {pdf_file: _file_hash(pdf_file) for pdf_file in pdf_files}
+        for chunks, embeddings in self._embedded_chunks(pdf_files, file_hashes):
+            self._add_chunks(vectorstore, chunks, embeddings)
+
         print(f"Vectorstore created with {vectorstore._collection.count()} documents")
+        self.vectorstore = vectorstore
         self.retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": self.max_retrieval_docs})
 
-    def load_existing_vector_store(self):
-        """Load existing vector store without recreating"""
+    def _create_quantized_index(self, embeddings):
+        """Train a FAISS IVF-PQ or int8 scalar-quantized index on a sample of embeddings."""
+        import faiss
+        import numpy as np
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        num_vectors, dimension = vectors.shape
+        if self.faiss_quantization == "int8":
+            # One byte per dimension, scaled per dimension to the trained value range: 4x smaller than float32
+            index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit)
+            index.train(vectors)
+            return index
+
+        if num_vectors < 256:
+            # Not enough vectors to train 256 centroids per sub-quantizer, so fall back to an exact index
+            return faiss.IndexFlatL2(dimension)
+
+        nlist = max(1, int(np.sqrt(num_vectors)))
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dimension), dimension, nlist, self.pq_subquantizers, 8)
+        index.train(vectors)
+        index.nprobe = min(nlist, 16)
+        return index
+
+    def save_to_quantized_index(self, pdf_files):
+        """
+        Save the chunks of the given PDF files to a product-quantized FAISS index.
+
+        The first `faiss_train_size` embeddings train the index, which then stores
+        64-byte PQ codes instead of float32 vectors.
+
+        Args:
+            pdf_files: List of PDF file paths.
+        """
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+
+        vectorstore = None
+        pending_chunks, pending_embeddings = [], []
+        file_hashes = {pdf_file: _file_hash(pdf_file) for pdf_file in pdf_files}
+        for chunks, embeddings in self._embedded_chunks(pdf_files, file_hashes):
+            pending_chunks.extend(chunks)
+            pending_embeddings.extend(embeddings)
+            if vectorstore is None and len(pending_embeddings) < self.faiss_train_size:
+                continue
+            if vectorstore is None:
+                vectorstore = self._create_faiss_store(FAISS, InMemoryDocstore, pending_embeddings)
+            texts = [chunk.page_content for chunk in pending_chunks]
+            vectorstore.add_embeddings(list(zip(texts, pending_embeddings)), metadatas=[chunk.metadata for chunk in pending_chunks])
+            pending_chunks, pending_embeddings = [], []
+
+        if pending_chunks:
+            if vectorstore is None:
+                vectorstore = self._create_faiss_store(FAISS, InMemoryDocstore, pending_embeddings)
+            texts = [chunk.page_content for chunk in pending_chunks]
+            vectorstore.add_embeddings(list(zip(texts, pending_embeddings)), metadatas=[chunk.metadata for chunk in pending_chunks])
+
+        if vectorstore is None:
+            raise ValueError(f"No documents found in {self.folder_path}")
+
+        vectorstore.save_local(self.faiss_index_path)
+        print(f"Quantized index created with {vectorstore.index.ntotal} documents")
+        self.vectorstore = vectorstore
+        self.retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": self.max_retrieval_docs})
+
+    def _create_faiss_store(self, faiss_store_cls, docstore_cls, training_embeddings):
+        """Wrap a freshly trained quantized index in a LangChain FAISS vector store."""
+        return faiss_store_cls(
+            embedding_function=self.embeddings,
+            index=self._create_quantized_index(training_embeddings),
+            docstore=docstore_cls(),
+            index_to_docstore_id={},
+        )
+
+    def load_existing_quantized_index(self):
+        """Load existing FAISS index without recreating"""
+        from langchain_community.vectorstores import FAISS
+
+        # The docstore pickle is written by save_to_quantized_index, so it is trusted
+        vectorstore = FAISS.load_local(self.faiss_index_path, self.embeddings, allow_dangerous_deserialization=True)
+        print(f"Loaded existing quantized index with {vectorstore.index.ntotal} documents")
+        self.vectorstore = vectorstore
+        self.retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": self.max_retrieval_docs})
+
+    def _collection_metadata(self):
+        """HNSW settings for the Chroma collection."""
+        # Embeddings are L2-normalized, so inner product ranks exactly like cosine without the per-comparison norms
+        return {
+            "hnsw:space": "ip",
+            "hnsw:M": self.hnsw_m,
+            "hnsw:construction_ef": self.hnsw_construction_ef,
+            "hnsw:search_ef": self.hnsw_search_ef,
+        }
+
+    def _get_chroma_client(self):
+        """Open the persistent Chroma client once and share it across every collection operation."""
+        # Created lazily: opening the client creates db_name, which setup_knowledge_base uses to detect an existing store
+        if self._chroma_client is None:
+            self._chroma_client = chromadb.PersistentClient(path=self.db_name)
+        return self._chroma_client
+
+    def load_existing_vector_store(self, pdf_files):
+        """
+        Load existing vector store without recreating, adding any PDF files it does not contain yet.
+
+        Args:
+            pdf_files: List of PDF file paths that should be in the knowledge base.
+        """
         
+        # Same metadata as save_to_vector_store, in case the collection has to be created here
         vectorstore = Chroma(
-            persist_directory=self.db_name,
+            client=self._get_chroma_client(),
             embedding_function=self.embeddings,
-            collection_name=self.collection_name
+            collection_name=self.collection_name,
+            collection_metadata=self._collection_metadata(),
         )
+
+        file_hashes = {pdf_file: _file_hash(pdf_file) for pdf_file in pdf_files}
+        new_files = [
+            pdf_file for pdf_file in pdf_files
+            if not vectorstore._collection.get(where={"file_hash": file_hashes[pdf_file]}, limit=1, include=[])["ids"]
+        ]
+        if new_files:
+            print(f"Adding {len(new_files)} new PDF documents to the knowledge base...")
+            for chunks, embeddings in self._embedded_chunks(new_files, file_hashes):
+                self._add_chunks(vectorstore, chunks, embeddings)
+
         print(f"Loaded existing vectorstore with {vectorstore._collection.count()} documents")
+        self.vectorstore = vectorstore
         self.retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": self.max_retrieval_docs})
         
     def setup_knowledge_base(self):
         """Smart knowledge base setup - only recreate if needed"""
         
-        if os.path.exists(self.db_name):
+        pdf_files = self._list_pdfs()
+        if self.use_quantized_index:
+            if os.path.exists(self.faiss_index_path):
+                print("Loading existing quantized knowledge base...")
+                self.load_existing_quantized_index()
+            else:
+                print("Creating new quantized knowledge base...")
+                self.save_to_quantized_index(pdf_files)
+        elif os.path.exists(self.db_name):
             print("Loading existing knowledge base...")
-            self.load_existing_vector_store()
+            self.load_existing_vector_store(pdf_files)
         else:
             print("Creating new knowledge base...")
-            documents = self.load_documents()
-            chunks = self.split_documents(documents)
-            self.save_to_vector_store(chunks)
+            self.save_to_vector_store(pdf_files)
+
+    def _search_many(self, queries):
+        """Embed all queries in one call and run the vector search for all of them."""
+        embeddings = self.embeddings.embed_documents(queries)
+        if isinstance(self.vectorstore, Chroma):
+            # Chroma accepts a matrix of query embeddings and searches them in a single call
+            result = self.vectorstore._collection.query(
+                query_embeddings=embeddings, n_results=self.max_retrieval_docs, include=["documents", "metadatas"]
+            )
+            return [
+                [self._decompress_document(text, metadata) for text, metadata in zip(texts, metadatas)]
+                for texts, metadatas in zip(result["documents"], result["metadatas"])
+            ]
+        return [
+            [doc.page_content for doc in self.vectorstore.similarity_search_by_vector(embedding, k=self.max_retrieval_docs)]
+            for embedding in embeddings
+        ]
+
+    def _decompress_document(self, text, metadata):
+        """Return the plain text of a stored document, decompressing it if it was stored with zstd."""
+        if not (metadata and metadata.get("z")):
+            return text
+
+        import zstandard as zstd
+
+        if self._decompressor is None:
+            self._decompressor = zstd.ZstdDecompressor()
+        return self._decompressor.decompress(base64.b64decode(text)).decode()
+
+    def retrieve(self, queries):
+        """
+        Retrieve formatted results for a batch of queries.
+
+        The agent often re-issues the same query across tool-calling turns, so results are kept
+        in an LRU cache keyed by the normalized query and only cache misses are searched.
+
+        Args:
+            queries: List of query strings.
+
+        Returns:
+            List of formatted results, one per query.
+        """
+        normalized = [" ".join(query.split()).lower() for query in queries]
+        found = {query: self.retrieval_cache[query] for query in dict.fromkeys(normalized) if query in self.retrieval_cache}
+        missing = [query for query in dict.fromkeys(normalized) if query not in found]
+        if missing:
+            for query, texts in zip(missing, self._search_many(missing)):
+                if texts:
+                    results = [f"Document {i+1}:\n{text}" for i, text in enumerate(texts)]
+                    found[query] = "\n\n".join(results)
+                else:
+                    found[query] = "No relevant information was found in the available drug treatment and recovery documents for your query."
+
+        # Build the answer before touching the cache so evicting an entry of this batch is harmless
+        answers = [found[query] for query in normalized]
+        for query in dict.fromkeys(normalized):
+            self.retrieval_cache[query] = found[query]
+            self.retrieval_cache.move_to_end(query)
+        while len(self.retrieval_cache) > self.retrieval_cache_size:
+            self.retrieval_cache.popitem(last=False)
+        return answers
 
     def setup_llm_and_tools(self):
         """Setup the LLM and tools"""
@@ -125,12 +482,7 @@ class DrugTreatmentRAGAgent:
             Useful for retrieving authoritative medical and clinical information about how to treat or cure substance use disorders related to drugs like cocaine, methamphetamine, opioids, and other stimulants or depressants.
             Do not use this tool for general non-medical questions.
             """
-            docs = self.retriever.invoke(query)
-            if not docs:
-                return "No relevant information was found in the available drug treatment and recovery documents for your query."
-
-            results = [f"Document {i+1}:\n{doc.page_content}" for i, doc in enumerate(docs)]
-            return "\n\n".join(results)
+            return self.retrieve([query])[0]
 
         self.tools = [retriever_tool]
         rag_llm = ChatOpenAI(model="gpt-4o-mini")
@@ -155,9 +507,36 @@ class DrugTreatmentRAGAgent:
             response = self.llm_with_tools.invoke(messages)
             return {"messages": [response]}
 
+        tool_node = ToolNode(self.tools)
+
+        def call_tools(state: AgentState) -> AgentState:
+            # gpt-4o-mini often emits several retriever_tool calls at once; answer them with one embedding call
+            tool_calls = state["messages"][-1].tool_calls
+            if any(call["name"] != "retriever_tool" for call in tool_calls):
+                return tool_node.invoke(state)
+
+            # A call with missing or malformed args gets an error ToolMessage back, as ToolNode would
+            valid_calls = [call for call in tool_calls if isinstance(call.get("args", {}).get("query"), str)]
+            results = dict(zip(
+                (call["id"] for call in valid_calls),
+                self.retrieve([call["args"]["query"] for call in valid_calls]),
+            ))
+            messages = []
+            for call in tool_calls:
+                if call["id"] in results:
+                    messages.append(ToolMessage(content=results[call["id"]], name=call["name"], tool_call_id=call["id"]))
+                else:
+                    messages.append(ToolMessage(
+                        content=f"Error: retriever_tool requires a string 'query' argument, got {call.get('args')!r}. Please fix your call and try again.",
+                        name=call["name"],
+                        tool_call_id=call["id"],
+                        status="error",
+                    ))
+            return {"messages": messages}
+
         graph_builder = StateGraph(AgentState)
         graph_builder.add_node("rag_llm", call_rag_llm)
-        graph_builder.add_node("tools", ToolNode(self.tools))
+        graph_builder.add_node("tools", call_tools)
 
         graph_builder.add_conditional_edges("rag_llm", tool_router, {True: "tools", False: END})
         graph_builder.add_edge("tools", "rag_llm")
@@ -176,10 +555,17 @@ class DrugTreatmentRAGAgent:
                 break
 
             messages = [HumanMessage(content=user_input)]
-            result = self.rag_agent_graph.invoke({"messages": messages}, config=config)
-
             print("\n=== ANSWER ===")
-            print(result["messages"][-1].content)
+            if not self.stream_answers:
+                result = self.rag_agent_graph.invoke({"messages": messages}, config=config)
+                print(result["messages"][-1].content)
+                continue
+
+            # Stream tokens from the LLM node only; tool results are streamed too but aren't part of the answer
+            for chunk, metadata in self.rag_agent_graph.stream({"messages": messages}, config=config, stream_mode="messages"):
+                if metadata.get("langgraph_node") == "rag_llm" and chunk.content:
+                    print(chunk.content, end="", flush=True)
+            print()
 
     def start(self):
         self.setup_knowledge_base()
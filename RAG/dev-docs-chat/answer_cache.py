@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """LRU + TTL cache of chat answers keyed by the embedding of the question.
+
+    A question whose embedding has cosine similarity >= `threshold` with a cached
+    question gets the cached answer back, so near-duplicates ("summarize docs" vs
+    "summarise the docs") skip retrieval and generation. Embeddings are expected
+    to be L2-normalized, so cosine similarity is a plain dot product.
+    """
+
+    def __init__(self, threshold, capacity, ttl_seconds):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # question -> (embedding, answer, source ids, created at)
+        self._lock = threading.Lock()
+
+    def lookup(self, embedding):
+        """Return the cached answer for the closest question above the threshold, or None."""
+        query = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._evict_expired()
+            if not self._entries:
+                return None
+
+            questions = list(self._entries)
+            matrix = np.stack([self._entries[question][0] for question in questions])
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+
+            self._entries.move_to_end(questions[best])
+            return self._entries[questions[best]][1]
+
+    def add(self, question, embedding, answer, sources):
+        """Cache an answer along with the sources it was generated from."""
+        with self._lock:
+            self._entries[question] = (
+                np.asarray(embedding, dtype=np.float32),
+                answer,
+                frozenset(sources),
+                time.monotonic(),
+            )
+            self._entries.move_to_end(question)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def invalidate_source(self, source):
+        """Drop every answer built from `source`, or from chunks with no recorded source."""
+        with self._lock:
+            for question in [
+                question
+                for question, (_, _, sources, _) in self._entries.items()
+                if source in sources or None in sources
+            ]:
+                del self._entries[question]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict_expired(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        for question in [
+            question
+            for question, (_, _, _, created_at) in self._entries.items()
+            if created_at < cutoff
+        ]:
+            del self._entries[question]
@@ -1,16 +1,17 @@
+import threading
 import gradio as gr
 from dotenv import load_dotenv
 from handle_file_ingestion import (
-    file_upload_handler,
+    batch_file_upload_handler,
     get_uploaded_files,
 )
 from handle_url_ingestion import (
-    url_upload_handler,
+    batch_url_upload_handler,
     get_uploaded_urls,
 )
-from manage_data import delete_document, delete_url, clear_all_data
-from handle_chat import handle_chat
-from shared_utils import SUPPORTED_FILE_TYPES
+from manage_data import delete_documents, delete_urls, clear_all_data
+from handle_chat import handle_chat, warm_up_retrieval
+from shared_utils import SUPPORTED_FILE_TYPES, INGEST_CONCURRENCY
 
 load_dotenv()
 
@@ -49,12 +50,19 @@ def file_upload_ui():
             )
 
         with gr.Column(scale=8):
-            file_input = gr.File(label="Upload File", file_types=SUPPORTED_FILE_TYPES)
+            file_input = gr.File(
+                label="Upload Files",
+                file_types=SUPPORTED_FILE_TYPES,
+                file_count="multiple",
+            )
             output = gr.Textbox(label="Status")
 
             upload_button = gr.Button("📤 Ingest File", variant="primary")
             upload_button.click(
-                fn=file_upload_handler, inputs=file_input, outputs=output
+                fn=batch_file_upload_handler,
+                inputs=file_input,
+                outputs=output,
+                concurrency_limit=INGEST_CONCURRENCY,
             )
 
     return file_input, upload_button, output
@@ -69,7 +77,7 @@ def url_upload_ui():
             ## 🌐 URL Ingestion Instructions
             
             **📋 How to ingest web content:**
-            1. **Enter URL**: Paste a valid HTTPS URL (e.g., https://www.example.com)
+            1. **Enter URLs**: Paste one or more valid HTTPS URLs, one per line (e.g., https://www.example.com)
             2. **Click Ingest**: The webpage will be scraped and processed
             3. **Wait for Processing**: Content will be extracted, chunked, and embedded
             4. **Check Status**: Look for the green ✅ success message when complete
@@ -91,12 +99,20 @@ def url_upload_ui():
 
         with gr.Column(scale=8):
             url_input = gr.Textbox(
-                label="Document URL", placeholder="https://www.example.com"
+                label="Document URLs",
+                placeholder="https://www.example.com",
+                info="One URL per line",
+                lines=3,
             )
             output = gr.Textbox(label="Status")
 
             upload_button = gr.Button("🌐 Ingest URL", variant="primary")
-            upload_button.click(fn=url_upload_handler, inputs=url_input, outputs=output)
+            upload_button.click(
+                fn=batch_url_upload_handler,
+                inputs=url_input,
+                outputs=output,
+                concurrency_limit=INGEST_CONCURRENCY,
+            )
 
     return url_input, upload_button, output
 
@@ -110,23 +126,24 @@ def manage_data_ui():
             with gr.Column(scale=1):
                 gr.Markdown("### 📁 Uploaded Files")
                 file_dropdown = gr.Dropdown(
-                    label="Select File to Delete",
+                    label="Select Files to Delete",
                     choices=get_uploaded_files(),
+                    multiselect=True,
                     interactive=True,
                 )
-                delete_file_btn = gr.Button("🗑️ Delete Selected File", variant="stop")
+                delete_file_btn = gr.Button("🗑️ Delete Selected Files", variant="stop")
                 refresh_files_btn = gr.Button("🔄 Refresh File List")
                 file_delete_output = gr.Textbox(
                     label="File Delete Result", visible=False
                 )
 
-                def delete_selected_file(filename):
-                    if filename:
-                        result = delete_document(filename)
+                def delete_selected_files(filenames):
+                    if filenames:
+                        result = delete_documents(filenames)
                         # Refresh the dropdown
                         new_choices = get_uploaded_files()
                         return gr.update(value=result, visible=True), gr.update(
-                            choices=new_choices, value=None
+                            choices=new_choices, value=[]
                         )
                     return (
                         gr.update(value="No file selected", visible=True),
@@ -134,7 +151,7 @@ def manage_data_ui():
                     )
 
                 delete_file_btn.click(
-                    delete_selected_file,
+                    delete_selected_files,
                     inputs=file_dropdown,
                     outputs=[file_delete_output, file_dropdown],
                 )
@@ -147,26 +164,27 @@ def manage_data_ui():
             with gr.Column(scale=1):
                 gr.Markdown("### 🌐 Ingested URLs")
                 url_dropdown = gr.Dropdown(
-                    label="Select URL to Delete",
+                    label="Select URLs to Delete",
                     choices=get_uploaded_urls(),
+                    multiselect=True,
                     interactive=True,
                 )
-                delete_url_btn = gr.Button("🗑️ Delete Selected URL", variant="stop")
+                delete_url_btn = gr.Button("🗑️ Delete Selected URLs", variant="stop")
                 refresh_urls_btn = gr.Button("🔄 Refresh URL List")
                 url_delete_output = gr.Textbox(label="URL Delete Result", visible=False)
 
-                def delete_selected_url(url):
-                    if url:
-                        result = delete_url(url)
+                def delete_selected_urls(urls):
+                    if urls:
+                        result = delete_urls(urls)
                         # Refresh the dropdown
                         new_choices = get_uploaded_urls()
                         return gr.update(value=result, visible=True), gr.update(
-                            choices=new_choices, value=None
+                            choices=new_choices, value=[]
                         )
                     return gr.update(value="No URL selected", visible=True), gr.update()
 
                 delete_url_btn.click(
-                    delete_selected_url,
+                    delete_selected_urls,
                     inputs=url_dropdown,
                     outputs=[url_delete_output, url_dropdown],
                 )
@@ -256,7 +274,12 @@ with gr.Blocks(title="Developer Docs Assistant") as demo:
         with gr.TabItem("Ask Questions"):
             chat_ui()
 
-demo.launch()
+# Ingestion worker processes are spawned and re-import this module, so they must not launch the app
+if __name__ == "__main__":
+    # Warm up in the background so the UI comes up immediately
+    threading.Thread(target=warm_up_retrieval, daemon=True).start()
+
+    demo.launch()
 
-# Add a callback to run cleanup when the app shuts down
-demo.close(fn=clear_all_data)
+    # Add a callback to run cleanup when the app shuts down
+    demo.close(fn=clear_all_data)
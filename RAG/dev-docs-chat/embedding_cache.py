@@ -0,0 +1,121 @@
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+from collections import OrderedDict
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def _quantize(vector):
+    """Pack a vector as int8 with a per-vector float32 scale: 4 + dim bytes instead of 4 * dim."""
+    values = np.asarray(vector, dtype=np.float32)
+    scale = float(np.abs(values).max()) / 127 or 1.0
+    codes = np.round(values / scale).astype(np.int8)
+    return struct.pack("f", scale) + codes.tobytes()
+
+
+def _dequantize(blob):
+    (scale,) = struct.unpack_from("f", blob)
+    return (np.frombuffer(blob, dtype=np.int8, offset=4).astype(np.float32) * scale).tolist()
+
+
+class CachedEmbedder(Embeddings):
+    """Embeddings wrapper that skips chunks it has already embedded.
+
+    Vectors are keyed by sha256(model_name + "\\0" + text), kept in an in-memory
+    LRU of `capacity` entries and persisted to a SQLite file, so re-uploading a
+    document (or boilerplate shared across documents) costs no model calls.
+    Cached vectors are stored int8-quantized with a per-vector scale, a 4x saving
+    whose effect on cosine similarity is well below retrieval noise.
+    """
+
+    def __init__(self, embedder, model_name, path, capacity):
+        self.embedder = embedder
+        self.model_name = model_name
+        self.path = path
+        self.capacity = capacity
+        self._memory = OrderedDict()  # key -> quantized vector bytes
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode()).hexdigest()
+
+    def _get_db(self):
+        """Open the cache database on first use."""
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # Superseded float32 table from before vectors were quantized
+            self._db.execute("DROP TABLE IF EXISTS embeddings")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings_int8 (key TEXT PRIMARY KEY, vector BLOB)"
+            )
+        return self._db
+
+    def _remember(self, key, blob):
+        self._memory[key] = blob
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+    def embed_documents(self, texts):
+        """Embed texts, calling the wrapped model only for cache misses."""
+        keys = [self._key(text) for text in texts]
+        blobs = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    blobs[key] = self._memory[key]
+
+            missing = [key for key in dict.fromkeys(keys) if key not in blobs]
+            db = self._get_db()
+            # Look up the rest on disk, staying under SQLite's bound-parameter limit
+            for start in range(0, len(missing), 500):
+                batch = missing[start : start + 500]
+                rows = db.execute(
+                    f"SELECT key, vector FROM embeddings_int8 WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+                for key, blob in rows:
+                    blobs[key] = blob
+                    self._remember(key, blob)
+
+        vectors = {key: _dequantize(blob) for key, blob in blobs.items()}
+
+        misses = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                misses[key] = text
+        if misses:
+            new_vectors = self.embedder.embed_documents(list(misses.values()))
+            new_blobs = [_quantize(vector) for vector in new_vectors]
+            with self._lock:
+                db = self._get_db()
+                db.executemany(
+                    "INSERT OR REPLACE INTO embeddings_int8 (key, vector) VALUES (?, ?)",
+                    list(zip(misses, new_blobs)),
+                )
+                for key, vector, blob in zip(misses, new_vectors, new_blobs):
+                    vectors[key] = vector
+                    self._remember(key, blob)
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text):
+        """Queries are rarely repeated verbatim, so they go straight to the wrapped model."""
+        return self.embedder.embed_query(text)
+
+    def close(self):
+        """Close the cache database so its file can be removed."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            self._memory.clear()
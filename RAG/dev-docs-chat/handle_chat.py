@@ -1,21 +1,14 @@
-from langchain.memory import ConversationBufferMemory
-from langchain.chains import ConversationalRetrievalChain
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
-from vectorstore import vectorstore
+import asyncio
+import functools
+from vectorstore import get_vectorstore, get_embeddings, answer_cache
+from shared_utils import CHAT_MODEL
 
-# set up the LLM
-llm = ChatOpenAI(model="gpt-4o-mini")
+# Turns of chat history included in the prompt
+CHAT_HISTORY_TURNS = 6
 
-# set up the conversation memory for the chat with explicit output key
-memory = ConversationBufferMemory(
-    memory_key="chat_history", return_messages=True, output_key="answer"
-)
-
-# set up the retriever
-retriever = vectorstore.as_retriever(search_kwargs={"k": 5})
-
-# Create a system message that includes the context
+# Static instructions first, so every prompt starts with the same tokens and the
+# provider's prompt (prefix) cache can reuse them; the retrieved context changes
+# per question and goes after the chat history.
 system_message = """
 You are a helpful AI assistant for developer documentation. 
 Guidelines:
@@ -23,35 +16,103 @@ Guidelines:
 2. If asked about topics not in your knowledge base or chat history, suggest what documents might be useful to upload.
 3. If the user asks about a topic that is not related to the documents, politely explain that you are not able to answer that question.
 4. Always be helpful and professional.
+"""
 
+context_message = """
 Use the following pieces of context to answer the user's question. 
 ----------------
 {context}
 """
 
-# Create the prompt template using ChatPromptTemplate
-prompt = ChatPromptTemplate.from_messages(
-    [
-        ("system", system_message),
-        ("human", "{question}"),
-    ]
-)
-
-# set up the conversation chain with memory handling
-conversation_chain = ConversationalRetrievalChain.from_llm(
-    llm=llm,
-    retriever=retriever,
-    memory=memory,
-    combine_docs_chain_kwargs={"prompt": prompt},
-    verbose=True,
-)
-
-
-def handle_chat(message, history):
-    """Handle the chat conversation"""
+
+def _format_docs(docs):
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_chain():
+    """Build the conversation chain on the first chat message rather than at import.
+
+    A single LLM call per turn: the chat history goes straight into the answer
+    prompt instead of first being used to condense the question. The chain
+    outputs the retrieved "docs" followed by the streamed "answer".
+    """
+    from operator import itemgetter
+    from langchain_openai import ChatOpenAI
+    from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.runnables import RunnablePassthrough
+
+    # set up the LLM
+    llm = ChatOpenAI(model=CHAT_MODEL, streaming=True)
+
+    # set up the retriever
+    retriever = get_vectorstore().as_retriever(search_kwargs={"k": 5})
+
+    # Create the prompt template using ChatPromptTemplate
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", system_message),
+            MessagesPlaceholder("chat_history"),
+            ("system", context_message),
+            ("human", "{question}"),
+        ]
+    )
+
+    answer_chain = (
+        RunnablePassthrough.assign(context=lambda x: _format_docs(x["docs"]))
+        | prompt
+        | llm
+        | StrOutputParser()
+    )
+    return RunnablePassthrough.assign(
+        docs=itemgetter("question") | retriever
+    ) | RunnablePassthrough.assign(answer=answer_chain)
+
+
+def warm_up_retrieval():
+    """Build the chain and run one throwaway search so the first user question doesn't pay cold-start costs."""
+    try:
+        _get_chain()
+        get_vectorstore().similarity_search("warmup", k=1)
+        print("Retrieval warmed up")
+    except Exception as e:
+        print(f"Retrieval warm-up failed: {e}")
+
+
+async def handle_chat(message, history):
+    """Handle the chat conversation, yielding the answer as it is generated"""
     try:
+        # Only a first turn is a standalone question; follow-ups depend on the chat history
+        standalone = not history
+        if standalone:
+            question_embedding = await asyncio.to_thread(get_embeddings().embed_query, message)
+            cached_answer = answer_cache.lookup(question_embedding)
+            if cached_answer is not None:
+                yield cached_answer
+                return
+
+        # Gradio passes the session's history as role/content messages; keep the last few turns
+        chat_history = [
+            (turn["role"], turn["content"])
+            for turn in history[-2 * CHAT_HISTORY_TURNS :]
+            if turn["role"] in ("user", "assistant") and isinstance(turn["content"], str)
+        ]
+
         # Try to get response from knowledge base
-        response = conversation_chain.invoke({"question": message})
-        return response["answer"]
+        partial_answer = ""
+        docs = []
+        async for chunk in _get_chain().astream(
+            {"question": message, "chat_history": chat_history}
+        ):
+            if "docs" in chunk:
+                docs = chunk["docs"]
+            if "answer" in chunk:
+                partial_answer += chunk["answer"]
+                yield partial_answer
+
+        if standalone:
+            sources = [doc.metadata.get("source_id") for doc in docs]
+            answer_cache.add(message, question_embedding, partial_answer, sources)
     except Exception as e:
-        return f"I encountered an error: {str(e)}. Please try again."
+        yield f"I encountered an error: {str(e)}. Please try again."
@@ -1,46 +1,83 @@
+import hashlib
+import multiprocessing
 import os
+from itertools import islice
+import gradio as gr
+import pymupdf
+from langchain_core.document_loaders import Blob
+from langchain_core.documents import Document
 from langchain_community.document_loaders import (
     UnstructuredMarkdownLoader,
     TextLoader,
-    PyPDFLoader,
+    PyMuPDFLoader,
     CSVLoader,
     UnstructuredExcelLoader,
     UnstructuredPowerPointLoader,
     UnstructuredWordDocumentLoader,
 )
+from langchain_community.document_loaders.parsers import PyMuPDFParser
 from langchain_community.vectorstores.utils import filter_complex_metadata
-from shared_utils import UPLOADS_DIR, upload_file_dir
-from vectorstore import chunk_and_embed_documents
+from shared_utils import get_uploads_db, get_process_pool
+from vectorstore import prepare_chunks, BufferedIngestor, delete_documents_by_sources
 
-def save_uploaded_file_record(filename):
-    """Save file record to the uploaded files record file."""
-    os.makedirs(UPLOADS_DIR, exist_ok=True)
-    with open(upload_file_dir, "a") as f:
-        f.write(f"{filename.strip()}\n")
+def save_uploaded_file_record(filename, file_path=None, digest=None):
+    """Save file record to the uploaded files table."""
+    get_uploads_db().execute(
+        "INSERT OR REPLACE INTO files (name, path, digest) VALUES (?, ?, ?)",
+        (filename.strip(), file_path, digest),
+    )
 
 
 def get_uploaded_files():
-    """Retrieve list of all uploaded files from the record file."""
-    if not os.path.exists(upload_file_dir):
-        return []
-    with open(upload_file_dir, "r") as f:
-        files = [line.strip() for line in f.readlines()]
-        return files
+    """Retrieve list of all uploaded files from the uploaded files table."""
+    rows = get_uploads_db().execute("SELECT name FROM files ORDER BY rowid")
+    return [name for (name,) in rows]
 
 
 def delete_file_record(filename):
-    """Remove a specific file from the uploaded files record file."""
-    files = get_uploaded_files()
-    if not files:
-        return
-    with open(upload_file_dir, "w") as f:
-        for name in files:
-            if name != filename:
-                f.write(f"{name}\n")
+    """Remove a specific file from the uploaded files table."""
+    get_uploads_db().execute("DELETE FROM files WHERE name = ?", (filename,))
 
 
-def load_documents_from_file(file_path):
-    """Load and parse documents from a file based on its extension."""
+# PDFs with at least this many pages are parsed by several processes, PDF_PAGES_PER_TASK pages at a time
+PARALLEL_PDF_MIN_PAGES = 50
+PDF_PAGES_PER_TASK = 5
+
+
+def _load_pdf_pages(file_path, start, stop):
+    """Extract pages [start, stop) of a PDF as Documents shaped like PyMuPDFLoader's output."""
+    with pymupdf.open(file_path) as pdf:
+        # Normalize the document metadata exactly as PyMuPDFLoader does, so it doesn't depend on the path taken
+        doc_metadata = {
+            "producer": "PyMuPDF",
+            "creator": "PyMuPDF",
+            "creationdate": "",
+        } | PyMuPDFParser()._extract_metadata(pdf, Blob.from_path(file_path))
+        return [
+            Document(
+                page_content=pdf[page].get_text().strip(),
+                metadata={**doc_metadata, "page": page},
+            )
+            for page in range(start, stop)
+        ]
+
+
+def _load_pdf_in_parallel(file_path, page_count):
+    """Split a long PDF into page ranges and extract them across worker processes, yielding pages in order."""
+    starts = list(range(0, page_count, PDF_PAGES_PER_TASK))
+    stops = [min(start + PDF_PAGES_PER_TASK, page_count) for start in starts]
+    for pages in get_process_pool().map(
+        _load_pdf_pages, [file_path] * len(starts), starts, stops
+    ):
+        yield from pages
+
+
+# Documents are handed on this many at a time, so a long PDF is never held in memory whole
+DOCUMENT_BATCH_SIZE = 50
+
+
+def iter_document_batches(file_path):
+    """Lazily parse a file based on its extension, yielding its documents in batches."""
     # Get file extension in lowercase
     _, ext = os.path.splitext(file_path)
     ext = ext.lower()
@@ -48,7 +85,8 @@ def load_documents_from_file(file_path):
     # Select loader based on extension
     loader = None
     if ext == ".pdf":
-        loader = PyPDFLoader(file_path)
+        # PyMuPDF's C text extractor is several times faster than pypdf on large PDFs
+        loader = PyMuPDFLoader(file_path)
     elif ext in [".md", ".markdown"]:
         loader = UnstructuredMarkdownLoader(file_path)
     elif ext == ".txt":
@@ -66,12 +104,33 @@ def load_documents_from_file(file_path):
         loader = CSVLoader(file_path, csv_args={"delimiter": ","})
     else:
         print(f"Unsupported file type: {ext}")
-        return None
+        return
+
+    docs = None
+    # Shard long PDFs, unless already running inside a batch-ingestion worker process
+    if ext == ".pdf" and multiprocessing.parent_process() is None:
+        with pymupdf.open(file_path) as pdf:
+            page_count = pdf.page_count
+        if page_count >= PARALLEL_PDF_MIN_PAGES:
+            docs = _load_pdf_in_parallel(file_path, page_count)
+    if docs is None:
+        docs = loader.lazy_load()
+
+    while batch := list(islice(docs, DOCUMENT_BATCH_SIZE)):
+        # Most loaders only produce simple metadata, so skip the copy-and-filter pass unless it is needed
+        if any(
+            not isinstance(value, (str, bool, int, float))
+            for doc in batch
+            for value in doc.metadata.values()
+        ):
+            batch = filter_complex_metadata(batch)
+        yield batch
 
+
+def load_documents_from_file(file_path):
+    """Load and parse documents from a file based on its extension."""
     try:
-        docs = loader.load()
-        filtered_docs = filter_complex_metadata(docs)
-        return filtered_docs
+        return [doc for batch in iter_document_batches(file_path) for doc in batch]
     except Exception as e:
         print(f"Error loading file {file_path}: {e}")
         return None
@@ -79,44 +138,159 @@ def load_documents_from_file(file_path):
 
 def check_duplicate_file(file_name):
     """Check if a file has already been uploaded."""
-    for name in get_uploaded_files():
-        if name == file_name:
-            return True
-    return False
+    row = get_uploads_db().execute(
+        "SELECT 1 FROM files WHERE name = ?", (file_name,)
+    ).fetchone()
+    return row is not None
+
+
+def file_content_digest(file_path):
+    """SHA-256 of a file's bytes, so identical content uploaded under another name is recognised."""
+    with open(file_path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
 
 
-def file_upload_handler(input_file):
+def find_file_by_digest(digest):
+    """Return the name of an uploaded file with the given content digest, or None."""
+    row = get_uploads_db().execute(
+        "SELECT name FROM files WHERE digest = ?", (digest,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _load_and_chunk_file(file_path, file_name):
+    """Parse one uploaded file and split it into chunks; runs in a worker process for batches."""
+    print(f"Extracting docs from uploaded file: {file_name}")
+    docs = load_documents_from_file(file_path)
+    if not docs:
+        return []
+    return prepare_chunks(
+        docs, source_type="file", source_path=file_path, source_id=file_name
+    )
+
+
+def file_upload_handler(input_file, progress=gr.Progress()):
     """Process and embed documents from an uploaded file."""
     if input_file is None:
         return "❌ Please select a file to upload"
 
-    file_path = input_file.name if hasattr(input_file, "name") else str(input_file)
+    return batch_file_upload_handler([input_file], progress)
 
-    if not os.path.exists(file_path):
-        return "❌ File does not exist"
 
-    file_name = os.path.basename(file_path)
+def batch_file_upload_handler(input_files, progress=gr.Progress()):
+    """Process and embed documents from several uploaded files.
 
-    # Check for duplicate file
-    if check_duplicate_file(file_name):
-        return f"❌ File '{file_name}' is already uploaded. Please select a different file or remove the existing file first."
+    Files are parsed and chunked in parallel worker processes, then all of
+    their chunks go through a single embedding and upsert run.
+    """
+    if not input_files:
+        return "❌ Please select a file to upload"
 
-    try:
-        # Load documents from file
-        print(f"Extracting docs from uploaded file: {file_name}")
-        docs = load_documents_from_file(file_path)
+    messages = []
+    pending = []  # (file_path, file_name, digest) of files that passed the duplicate checks
+    pending_digests = {}
+    progress(0, desc="Checking for duplicates")
+    for input_file in input_files:
+        file_path = input_file.name if hasattr(input_file, "name") else str(input_file)
+
+        if not os.path.exists(file_path):
+            messages.append("❌ File does not exist")
+            continue
+
+        file_name = os.path.basename(file_path)
 
-        if not docs:
-            return "❌ No docs found from the uploaded file"
+        # Check for duplicate file
+        if check_duplicate_file(file_name) or any(name == file_name for _, name, _ in pending):
+            messages.append(
+                f"❌ File '{file_name}' is already uploaded. Please select a different file or remove the existing file first."
+            )
+            continue
 
-        # Chunk and embed file documents
-        chunk_and_embed_documents(docs, source_type="file", source_path=file_path)
+        # Check for the same content uploaded under a different name
+        digest = file_content_digest(file_path)
+        existing_file = find_file_by_digest(digest) or pending_digests.get(digest)
+        if existing_file:
+            messages.append(
+                f"❌ File '{file_name}' has the same content as the already uploaded '{existing_file}'."
+            )
+            continue
 
-        # Save record
-        print(f"Saving record for file: {file_name}\n\n")
-        save_uploaded_file_record(file_name)
+        pending.append((file_path, file_name, digest))
+        pending_digests[digest] = file_name
 
-        return f"✅ {file_name} processed and embedded successfully!"
+    if not pending:
+        return "\n".join(messages)
+
+    ingestor = BufferedIngestor()
+    file_paths = [file_path for file_path, _, _ in pending]
+    file_names = [file_name for _, file_name, _ in pending]
+    parsed = set()
+    try:
+        # Chunks are embedded in large batches while the remaining files are still being parsed
+        progress(0.1, desc="Parsing and embedding files")
+        with ingestor:
+            current = None
+            for file_name, chunks in _parse_files(file_paths, file_names):
+                # Files come in order, so a new name means the previous file is fully parsed
+                if current is not None and file_name != current:
+                    ingestor.finish(current)
+                current = file_name
+                if chunks:
+                    ingestor.add(file_name, chunks)
+                    parsed.add(file_name)
+            if current is not None:
+                ingestor.finish(current)
+        for file_name in file_names:
+            if file_name not in parsed:
+                messages.append(f"❌ No docs found from the uploaded file '{file_name}'")
     except Exception as e:
-        print(f"Error processing file {file_path}: {e}")
-        return f"❌ Error processing file: {str(e)}"
+        print(f"Error processing files {[file_name for _, file_name, _ in pending]}: {e}")
+        messages.append(f"❌ Error processing file: {str(e)}")
+    finally:
+        # Record every file whose chunks all reached the vector store, even if a later flush failed
+        progress(0.95, desc="Saving records")
+        for file_path, file_name, digest in pending:
+            if file_name in ingestor.completed_sources:
+                print(f"Saving record for file: {file_name}\n\n")
+                save_uploaded_file_record(file_name, file_path, digest)
+                messages.append(f"✅ {file_name} processed and embedded successfully!")
+
+        # Files cut off by the error may have some of their chunks stored; remove them so a retry starts clean
+        partial = [
+            file_name for file_name in file_names
+            if file_name in parsed and file_name not in ingestor.completed_sources
+        ]
+        if partial:
+            try:
+                delete_documents_by_sources(partial)
+                removed = "has been removed"
+            except Exception as e:
+                print(f"Error removing partly embedded files {partial}: {e}")
+                removed = "could not be cleaned up (uploading it again overwrites its chunks)"
+            for file_name in partial:
+                messages.append(
+                    f"❌ '{file_name}' was only partly embedded and {removed}. Please upload it again."
+                )
+
+    return "\n".join(messages)
+
+
+def _parse_files(file_paths, file_names):
+    """Yield (file name, chunks) in file order, parsing several files in parallel.
+
+    A single file is parsed here and yielded a batch of documents at a time,
+    so its chunks reach the vector store while the rest is still being read.
+    """
+    if len(file_paths) == 1:
+        file_path, file_name = file_paths[0], file_names[0]
+        print(f"Extracting docs from uploaded file: {file_name}")
+        for docs in iter_document_batches(file_path):
+            yield file_name, prepare_chunks(
+                docs, source_type="file", source_path=file_path, source_id=file_name
+            )
+        return
+
+    # Parsing is CPU-bound, so files are parsed on the shared worker pool
+    yield from zip(
+        file_names, get_process_pool().map(_load_and_chunk_file, file_paths, file_names)
+    )
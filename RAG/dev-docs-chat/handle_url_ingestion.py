@@ -1,107 +1,183 @@
-from urllib.parse import urlparse
-import os
-from langchain_community.document_loaders import UnstructuredURLLoader
-from langchain_community.vectorstores.utils import filter_complex_metadata
-import requests
-from shared_utils import UPLOADS_DIR, upload_url_dir
-from vectorstore import chunk_and_embed_documents
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+import gradio as gr
+from langchain_core.documents import Document
+import httpx
+from shared_utils import get_uploads_db
+from vectorstore import prepare_chunks, BufferedIngestor, delete_documents_by_sources
 
 def save_uploaded_url_record(url):
-    """Save URL record to the uploaded URLs file."""
-    os.makedirs(UPLOADS_DIR, exist_ok=True)
-    with open(upload_url_dir, "a") as f:
-        f.write(f"{url.strip()}\n")
+    """Save URL record to the uploaded URLs table."""
+    get_uploads_db().execute(
+        "INSERT OR REPLACE INTO urls (url) VALUES (?)", (url.strip(),)
+    )
 
 
 def get_uploaded_urls():
-    """Retrieve list of all uploaded URLs from the record file."""
-    if not os.path.exists(upload_url_dir):
-        return []
-    with open(upload_url_dir, "r") as f:
-        return [line.strip() for line in f.readlines()]
+    """Retrieve list of all uploaded URLs from the uploaded URLs table."""
+    rows = get_uploads_db().execute("SELECT url FROM urls ORDER BY rowid")
+    return [url for (url,) in rows]
 
 
 def delete_url_record(url):
-    """Remove a specific URL from the uploaded URLs record file."""
-    urls = get_uploaded_urls()
-    if not urls:
-        return
-    with open(upload_url_dir, "w") as f:
-        for u in urls:
-            if u != url:
-                f.write(f"{u}\n")
-
-
-def validate_and_check_url(url):
-    """Validate URL format and check if it's reachable."""
+    """Remove a specific URL from the uploaded URLs table."""
+    get_uploads_db().execute("DELETE FROM urls WHERE url = ?", (url,))
+
+
+# An https:// URL with a non-empty host and no whitespace, checked without any network call
+_URL_RE = re.compile(r"^https://[^\s/$.?#][^\s]*$")
+
+
+def validate_url(url):
+    """Validate URL format; reachability is established by the page fetch itself."""
     # Step 1: Basic format validation
     if not url.startswith("https://"):
         print(f"URL must start with https://: {url}")
         return False
 
     # Step 2: Check if it's a well-formed URL
-    parsed = urlparse(url)
-    if not parsed.netloc:
+    if not _URL_RE.match(url):
         print(f"Not a valid URL: {url}")
         return False
 
-    # Step 3: Check if the URL is reachable
+    return True
+
+
+async def _fetch_page(client, url):
+    """GET a page and return its HTML, or None if it is unreachable or responds with an error status."""
     try:
-        response = requests.head(url, timeout=15)
-        if response.status_code < 400:
-            print(f"URL is valid and reachable: {url}")
-            return True
-        else:
-            print(f"URL responded with status: {response.status_code}")
-            return False
-    except requests.RequestException as e:
+        response = await client.get(url)
+    except httpx.HTTPError as e:
         print(f"URL is not reachable: {e}")
-        return False
+        return None
+    if response.status_code >= 400:
+        print(f"URL responded with status: {response.status_code}")
+        return None
+    return response.text
+
+
+async def fetch_pages(urls):
+    """Fetch several pages concurrently over one pooled client, so DNS/TLS setup is shared."""
+    async with httpx.AsyncClient(
+        timeout=10.0,
+        follow_redirects=True,
+        transport=httpx.AsyncHTTPTransport(retries=0),
+    ) as client:
+        return await asyncio.gather(*(_fetch_page(client, url) for url in urls))
+
+
+def _partition_page(url, html):
+    """Extract a page's text the way UnstructuredURLLoader does in its default single mode."""
+    from unstructured.partition.html import partition_html
+
+    try:
+        elements = partition_html(text=html)
+    except Exception as e:
+        print(f"Error parsing URL {url}: {e}")
+        return []
+    text = "\n\n".join(str(element) for element in elements)
+    return [Document(page_content=text, metadata={"source": url})]
 
 
 def check_duplicate_url(url):
     """Check if a URL has already been uploaded."""
-    for u in get_uploaded_urls():
-        if u == url:
-            return True
-    return False
+    row = get_uploads_db().execute("SELECT 1 FROM urls WHERE url = ?", (url,)).fetchone()
+    return row is not None
 
 
-def url_upload_handler(url):
+def url_upload_handler(url, progress=gr.Progress()):
     """Process and embed documents from a given URL."""
-    input_url = url.strip()
-    if not input_url:
-        return "❌ Please enter a URL to ingest"
-
-    # Check for duplicate URL
-    if check_duplicate_url(input_url):
-        return f"❌ URL '{input_url}' is already ingested. Please enter a different URL or remove the existing URL first."
+    return batch_url_upload_handler(url, progress)
 
-    # Validate URL
-    validation_result = validate_and_check_url(input_url)
-    if not validation_result:
-        return "❌ URL is not valid"
 
-    try:
-        # Load documents from URL
-        print(f"\n\nExtracting docs from URL: {input_url}")
-        loader = UnstructuredURLLoader(urls=[input_url])
+def batch_url_upload_handler(urls, progress=gr.Progress()):
+    """Process and embed documents from one or more URLs, given one per line.
 
-        docs = loader.load()
-        filtered_docs = filter_complex_metadata(docs)
-
-        if not filtered_docs:
-            return "❌ No documents found from the URL"
+    Pages are fetched concurrently, parsed in a thread pool, and their chunks
+    embedded together.
+    """
+    input_urls = list(dict.fromkeys(url.strip() for url in urls.splitlines() if url.strip()))
+    if not input_urls:
+        return "❌ Please enter a URL to ingest"
 
-        # Chunk and embed URL documents
-        chunk_and_embed_documents(filtered_docs, source_type="url", source_path=input_url)
+    messages = []
+    pending = []
+    progress(0, desc="Checking URLs")
+    for input_url in input_urls:
+        # Check for duplicate URL
+        if check_duplicate_url(input_url):
+            messages.append(
+                f"❌ URL '{input_url}' is already ingested. Please enter a different URL or remove the existing URL first."
+            )
+        # Validate URL
+        elif not validate_url(input_url):
+            messages.append(f"❌ URL '{input_url}' is not valid")
+        else:
+            pending.append(input_url)
 
-        # Save record
-        print(f"Saving record for URL: {input_url}\n\n")
-        save_uploaded_url_record(input_url)
+    if not pending:
+        return "\n".join(messages)
 
-        return f"✅ {input_url} processed and embedded successfully!"
+    ingestor = BufferedIngestor()
+    added = set()
+    try:
+        # Load documents from URLs
+        print(f"\n\nExtracting docs from URLs: {pending}")
+        progress(0.1, desc="Fetching pages")
+        pages = asyncio.run(fetch_pages(pending))
+
+        fetched = []
+        for input_url, html in zip(pending, pages):
+            if html is None:
+                messages.append(f"❌ URL '{input_url}' is not reachable")
+            else:
+                fetched.append((input_url, html))
+
+        progress(0.3, desc="Parsing pages")
+        with ThreadPoolExecutor(max_workers=max(1, min(8, len(fetched)))) as executor:
+            docs_per_url = list(executor.map(lambda page: _partition_page(*page), fetched))
 
+        # Chunk and embed URL documents
+        progress(0.4, desc="Chunking and embedding")
+        with ingestor:
+            for (input_url, _), docs in zip(fetched, docs_per_url):
+                chunks = prepare_chunks(
+                    docs, source_type="url", source_path=input_url, source_id=input_url
+                )
+                if chunks:
+                    # Each page is added whole, so it is finished as soon as it is added
+                    ingestor.add(input_url, chunks)
+                    ingestor.finish(input_url)
+                    added.add(input_url)
+                else:
+                    messages.append(f"❌ No documents found from the URL '{input_url}'")
     except Exception as e:
-        print(f"Error processing URL {input_url}: {e}")
-        return f"❌ Error processing URL: {str(e)}"
+        print(f"Error processing URLs {pending}: {e}")
+        messages.append(f"❌ Error processing URL: {str(e)}")
+    finally:
+        # Save records for every URL whose chunks all reached the vector store
+        progress(0.95, desc="Saving records")
+        for input_url in ingestor.completed_sources:
+            print(f"Saving record for URL: {input_url}\n\n")
+            save_uploaded_url_record(input_url)
+            messages.append(f"✅ {input_url} processed and embedded successfully!")
+
+        # URLs cut off by the error may have some of their chunks stored; remove them so a retry starts clean
+        partial = [
+            input_url for input_url in pending
+            if input_url in added and input_url not in ingestor.completed_sources
+        ]
+        if partial:
+            try:
+                delete_documents_by_sources(partial)
+                removed = "has been removed"
+            except Exception as e:
+                print(f"Error removing partly embedded URLs {partial}: {e}")
+                removed = "could not be cleaned up (ingesting it again overwrites its chunks)"
+            for input_url in partial:
+                messages.append(
+                    f"❌ '{input_url}' was only partly embedded and {removed}. Please ingest it again."
+                )
+
+    return "\n".join(messages)
@@ -1,9 +1,10 @@
 import shutil
 from vectorstore import (
     clear_vectorstore,
-    delete_documents_by_source,
+    delete_documents_by_sources,
+    close_embedding_cache,
 )
-from shared_utils import UPLOADS_DIR, upload_file_dir, upload_url_dir
+from shared_utils import UPLOADS_DIR, uploads_db_path, close_uploads_db
 from handle_file_ingestion import (
     delete_file_record,
 )
@@ -14,45 +15,61 @@ import os
 
 
 def clean_record_files():
-    """Delete the uploads directory and all record files."""
-    # Delete the record files directory
+    """Delete the uploads directory, the upload records database and the embedding cache."""
+    # Release the databases before deleting their directory
+    close_uploads_db()
+    close_embedding_cache()
     if os.path.exists(UPLOADS_DIR):
         shutil.rmtree(UPLOADS_DIR)
 
 def delete_document(file_name):
     """Delete a specific file and its embeddings from the system."""
-    if not file_name:
+    return delete_documents([file_name] if file_name else [])
+
+
+def delete_documents(file_names):
+    """Delete several files and their embeddings from the system."""
+    if not file_names:
         return "❌ Please select a file to delete from the dropdown"
 
-    if not os.path.exists(upload_file_dir):
+    if not os.path.exists(uploads_db_path):
         return "No files to delete."
 
     # Remove file documents from vector DB
-    delete_documents_by_source(file_name)
+    delete_documents_by_sources(file_names)
 
     # Remove from record
-    delete_file_record(file_name)
+    for file_name in file_names:
+        delete_file_record(file_name)
 
-    print(f"\n\nDeleted File: {file_name}\nDeleted Embeddings for: {file_name}\n\n")
-    return f"Deleted File: {file_name}\nDeleted Embeddings for: {file_name}"
+    deleted = ", ".join(file_names)
+    print(f"\n\nDeleted Files: {deleted}\nDeleted Embeddings for: {deleted}\n\n")
+    return f"Deleted Files: {deleted}\nDeleted Embeddings for: {deleted}"
 
 
 def delete_url(url):
     """Delete a specific URL and its embeddings from the system."""
-    if not url:
+    return delete_urls([url] if url else [])
+
+
+def delete_urls(urls):
+    """Delete several URLs and their embeddings from the system."""
+    if not urls:
         return "❌ Please select a URL to delete from the dropdown"
 
-    if not os.path.exists(upload_url_dir):
+    if not os.path.exists(uploads_db_path):
         return "No URLs to delete."
 
     # Remove url documents from vector DB
-    delete_documents_by_source(url)
+    delete_documents_by_sources(urls)
 
     # Remove from record
-    delete_url_record(url)
+    for url in urls:
+        delete_url_record(url)
 
-    print(f"\n\nDeleted URL: {url}\nDeleted Embeddings for: {url}\n\n")
-    return f"Deleted URL: {url}\nDeleted Embeddings for: {url}"
+    deleted = ", ".join(urls)
+    print(f"\n\nDeleted URLs: {deleted}\nDeleted Embeddings for: {deleted}\n\n")
+    return f"Deleted URLs: {deleted}\nDeleted Embeddings for: {deleted}"
 
 
 def clear_all_data():
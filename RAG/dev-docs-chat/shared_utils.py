@@ -1,18 +1,48 @@
 import os
+import multiprocessing
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-PINECONE_INDEX_NAME = "dev-docs-chat"
+load_dotenv()
+
+PINECONE_INDEX_NAME = "dev-docs-chat-minilm"
+
+# Any OpenAI-compatible model; point OPENAI_BASE_URL at a vLLM server started with --enable-prefix-caching to self-host
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o-mini")
 
 UPLOADS_DIR = "uploads"
-UPLOADED_URL_RECORD = "uploaded_urls.txt"
-UPLOADED_FILE_RECORD = "uploaded_files.txt"
+UPLOADS_DB = "uploads.db"
+EMBEDDING_CACHE_DB = ".embed_cache"
 
-upload_file_dir = os.path.join(UPLOADS_DIR, UPLOADED_FILE_RECORD)
-upload_url_dir = os.path.join(UPLOADS_DIR, UPLOADED_URL_RECORD)
+uploads_db_path = os.path.join(UPLOADS_DIR, UPLOADS_DB)
+embedding_cache_path = os.path.join(UPLOADS_DIR, EMBEDDING_CACHE_DB)
 
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 100
 
+# Chunks embedded per embed_documents call, and vectors sent per Pinecone upsert request
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "512"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", "8"))
+
+# Chunks buffered across the files of a batch upload before they are embedded together
+INGEST_BUFFER_CHUNKS = int(os.getenv("INGEST_BUFFER_CHUNKS", "2000"))
+
+# Uploads that may be ingested at the same time (Gradio runs one per event by default)
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "4"))
+
+# Reuse the vectors of chunks that were embedded before (see embedding_cache.py)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_CAPACITY = int(os.getenv("EMBEDDING_CACHE_CAPACITY", "10000"))
+
+# Answer near-duplicate questions from earlier answers (see answer_cache.py)
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_CAPACITY = int(os.getenv("ANSWER_CACHE_CAPACITY", "256"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+
 SUPPORTED_FILE_TYPES = [
     ".pdf",
     ".md",
@@ -26,11 +56,89 @@ SUPPORTED_FILE_TYPES = [
     ".csv",
 ]
 
+# Built once at import rather than on every ingestion
+_TEXT_SPLITTER = RecursiveCharacterTextSplitter(
+    chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+)
+
+# Splitting is pure-Python and GIL-bound, so only document sets at least this large are split across processes
+PARALLEL_SPLIT_MIN_DOCS = 200
+
+
+def _split_document(doc):
+    return _TEXT_SPLITTER.split_documents([doc])
+
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """Return the worker process pool shared by every ingestion, starting it on first use.
+
+    Workers are spawned, not forked: the Gradio server is multi-threaded and holds
+    asyncio, httpx and SQLite state that a forked child would inherit mid-use.
+    Spawned workers re-import their modules, so the pool is kept for the life of
+    the app and that start-up cost is paid once. Work submitted to it must be
+    module-level functions.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pool
+
+
 def chunk_documents(docs):
     """Chunk documents into smaller pieces"""
     print("Chunking documents...")
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
-    )
-    chunks = text_splitter.split_documents(docs)
-    return chunks
+    # Batch-ingestion workers already split in parallel, one file each
+    if len(docs) < PARALLEL_SPLIT_MIN_DOCS or multiprocessing.parent_process() is not None:
+        return _TEXT_SPLITTER.split_documents(docs)
+
+    return [
+        chunk
+        for chunks in get_process_pool().map(_split_document, docs, chunksize=32)
+        for chunk in chunks
+    ]
+
+
+_uploads_db = None
+_uploads_db_lock = threading.Lock()
+
+
+def get_uploads_db():
+    """Return the shared connection to the upload records database, creating it on first use."""
+    global _uploads_db
+    # Gradio handlers run on concurrent threads; only one of them may open the database
+    with _uploads_db_lock:
+        if _uploads_db is None:
+            os.makedirs(UPLOADS_DIR, exist_ok=True)
+            # Autocommit mode: every record insert/delete is its own small transaction
+            _uploads_db = sqlite3.connect(
+                uploads_db_path, check_same_thread=False, isolation_level=None
+            )
+            _uploads_db.execute("PRAGMA journal_mode=WAL")
+            _uploads_db.execute(
+                "CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, path TEXT, digest TEXT)"
+            )
+            # Databases created before content hashes were recorded lack the digest column
+            columns = [row[1] for row in _uploads_db.execute("PRAGMA table_info(files)")]
+            if "digest" not in columns:
+                _uploads_db.execute("ALTER TABLE files ADD COLUMN digest TEXT")
+            _uploads_db.execute(
+                "CREATE INDEX IF NOT EXISTS files_digest ON files (digest)"
+            )
+            _uploads_db.execute("CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY)")
+        return _uploads_db
+
+
+def close_uploads_db():
+    """Close the upload records database so its files can be removed."""
+    global _uploads_db
+    with _uploads_db_lock:
+        if _uploads_db is not None:
+            _uploads_db.close()
+            _uploads_db = None
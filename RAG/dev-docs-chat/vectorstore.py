@@ -1,49 +1,268 @@
+import asyncio
+import functools
+import hashlib
 from pinecone import Pinecone, ServerlessSpec
 from langchain_pinecone import PineconeVectorStore
-from langchain_openai import OpenAIEmbeddings
 from dotenv import load_dotenv
-from shared_utils import PINECONE_INDEX_NAME, chunk_documents
+from shared_utils import (
+    PINECONE_INDEX_NAME,
+    EMBED_BATCH_SIZE,
+    UPSERT_BATCH_SIZE,
+    UPSERT_CONCURRENCY,
+    INGEST_BUFFER_CHUNKS,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_CAPACITY,
+    embedding_cache_path,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_CAPACITY,
+    ANSWER_CACHE_TTL_SECONDS,
+    chunk_documents,
+)
+from embedding_cache import CachedEmbedder
+from answer_cache import SemanticAnswerCache
 
 load_dotenv()
 
-# Initialize pinecone vectorstore
-pc = Pinecone()
-
-# Create pinecone index (index is a collection of vectors) if it doesn't exist
-if not pc.has_index(PINECONE_INDEX_NAME):
-    print("CREATING NEW INDEX ...")
-    pc.create_index(
-        name=PINECONE_INDEX_NAME,
-        dimension=1536,  # dimensions of text-embedding-3-small
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1"),
+# Pinecone accepts at most this many IDs per delete request
+PINECONE_DELETE_BATCH_SIZE = 1000
+
+
+@functools.lru_cache(maxsize=1)
+def get_index():
+    """Connect to the Pinecone index on first use, creating it if it doesn't exist."""
+    # Initialize pinecone vectorstore
+    pc = Pinecone()
+
+    # Create pinecone index (index is a collection of vectors) if it doesn't exist
+    if not pc.has_index(PINECONE_INDEX_NAME):
+        print("CREATING NEW INDEX ...")
+        pc.create_index(
+            name=PINECONE_INDEX_NAME,
+            dimension=384,  # dimensions of all-MiniLM-L6-v2
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region="us-east-1"),
+        )
+
+    return pc.Index(PINECONE_INDEX_NAME)
+
+
+@functools.lru_cache(maxsize=1)
+def get_embeddings():
+    """Load the embedding model on first use, so delete-only paths never load it."""
+    import torch
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    # Local sentence-transformer embeddings avoid an API round-trip per embedding call
+    embeddings = HuggingFaceEmbeddings(
+        model_name="sentence-transformers/all-MiniLM-L6-v2",
+        model_kwargs={"device": "cuda" if torch.cuda.is_available() else "cpu"},
+        encode_kwargs={"batch_size": 128, "normalize_embeddings": True},
     )
+    if EMBEDDING_CACHE_ENABLED:
+        embeddings = CachedEmbedder(
+            embeddings,
+            model_name=embeddings.model_name,
+            path=embedding_cache_path,
+            capacity=EMBEDDING_CACHE_CAPACITY,
+        )
+    return embeddings
+
+
+@functools.lru_cache(maxsize=1)
+def get_vectorstore():
+    return PineconeVectorStore(embedding=get_embeddings(), index=get_index())
 
-index = pc.Index(PINECONE_INDEX_NAME)
 
-vectorstore = PineconeVectorStore(embedding=OpenAIEmbeddings(), index=index)
+# Cached chat answers live next to the vector store so every ingestion and deletion can invalidate them
+answer_cache = SemanticAnswerCache(
+    threshold=ANSWER_CACHE_THRESHOLD,
+    capacity=ANSWER_CACHE_CAPACITY,
+    ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+)
 
 
-def chunk_and_embed_documents(docs, source_type, source_path):
-    """Chunk and embed documents to the vector store"""
+def chunk_and_embed_documents(docs, source_type, source_path, source_id):
+    """Chunk and embed documents to the vector store.
+
+    Vector IDs are prefixed with a key derived from `source_id` so the chunks of
+    one source can later be deleted by ID rather than by scanning metadata.
+    """
+    chunks = prepare_chunks(docs, source_type, source_path, source_id)
+    embed_chunks({source_id: chunks})
+
+
+def prepare_chunks(docs, source_type, source_path, source_id):
+    """Tag documents with their source and split them into chunks, without embedding them."""
     # Add metadata to documents
+    source_metadata = {
+        "source_type": source_type,
+        "source_path": source_path,
+        "source_id": source_id,
+    }
     for doc in docs:
-        doc.metadata["source_type"] = source_type
-        doc.metadata["source_path"] = source_path
+        doc.metadata.update(source_metadata)
 
     # Chunk documents
-    chunks = chunk_documents(docs)
+    return chunk_documents(docs)
+
+
+def _vector_id_prefix(source_id):
+    """ID prefix of a source's vectors; the readable source ID is kept in metadata."""
+    # Pinecone IDs must be ASCII and at most 512 characters, and a fixed-length key
+    # can't be a prefix of another source's key the way raw names can
+    return f"{hashlib.sha256(source_id.encode()).hexdigest()}::"
 
+
+def embed_chunks(chunks_by_source, start_indexes=None):
+    """Embed and store the chunks of one or more sources in a single pipeline run.
+
+    `start_indexes` maps a source ID to the number of its chunks already stored,
+    so a source ingested in several runs keeps distinct vector IDs.
+    """
     # Add documents to vector store
     print("Adding docs to vector store...")
-    vectorstore.add_documents(chunks)
+    start_indexes = start_indexes or {}
+    ids, chunks = [], []
+    for source_id, source_chunks in chunks_by_source.items():
+        start = start_indexes.get(source_id, 0)
+        prefix = _vector_id_prefix(source_id)
+        ids.extend(f"{prefix}{start + i}" for i in range(len(source_chunks)))
+        chunks.extend(source_chunks)
+    asyncio.run(_embed_and_upsert(ids, chunks))
+
+    # New content can change the answer to any cached question
+    answer_cache.clear()
+
+
+class BufferedIngestor:
+    """Collect the chunks of several sources and embed them in large batches.
+
+    Chunks are flushed through `embed_chunks` once `max_chunks` are buffered
+    and when the `with` block exits normally. A source may be added over several
+    calls, in order, so long documents can be streamed in without being held
+    in memory whole; `flushed_sources` lists every source with chunks stored.
+    Once a source is marked with `finish`, it moves to `completed_sources` as
+    soon as all of its chunks are stored; a source that had no chunks at all
+    never completes, since nothing of it was ingested.
+    """
+
+    def __init__(self, max_chunks=INGEST_BUFFER_CHUNKS):
+        self.max_chunks = max_chunks
+        self.flushed_sources = []
+        self.completed_sources = []
+        self._finished = []  # sources fully added whose chunks may still be buffered
+        self._chunks_by_source = {}
+        self._stored_counts = {}  # source ID -> number of its chunks already flushed
+        self._buffered = 0
+
+    def add(self, source_id, chunks):
+        self._chunks_by_source.setdefault(source_id, []).extend(chunks)
+        self._buffered += len(chunks)
+        if self._buffered >= self.max_chunks:
+            self.flush()
+
+    def finish(self, source_id):
+        """Mark a source as fully added; no more of its chunks will follow."""
+        self._finished.append(source_id)
+        self._complete_finished()
+
+    def flush(self):
+        if self._chunks_by_source:
+            embed_chunks(self._chunks_by_source, self._stored_counts)
+            for source_id, chunks in self._chunks_by_source.items():
+                if source_id not in self._stored_counts:
+                    self.flushed_sources.append(source_id)
+                self._stored_counts[source_id] = self._stored_counts.get(source_id, 0) + len(chunks)
+        self._chunks_by_source = {}
+        self._buffered = 0
+        self._complete_finished()
+
+    def _complete_finished(self):
+        # Finished sources with nothing left in the buffer are fully stored; those that
+        # never had chunks are dropped, as there is nothing to record for them
+        for source_id in self._finished:
+            if source_id not in self._chunks_by_source and source_id in self._stored_counts:
+                self.completed_sources.append(source_id)
+        self._finished = [
+            source_id for source_id in self._finished if source_id in self._chunks_by_source
+        ]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+
+async def _embed_and_upsert(ids, chunks):
+    """Embed chunks batch by batch while the upserts of earlier batches are still in flight."""
+    semaphore = asyncio.Semaphore(UPSERT_CONCURRENCY)
+    index = get_index()
+    embeddings = get_embeddings()
+
+    async def upsert(vectors):
+        async with semaphore:
+            await asyncio.to_thread(index.upsert, vectors=vectors)
+
+    upserts = []
+    for start in range(0, len(chunks), EMBED_BATCH_SIZE):
+        batch = chunks[start : start + EMBED_BATCH_SIZE]
+        # Shared headers, footers and license text repeat across chunks; embed each distinct text once
+        unique_texts = list(dict.fromkeys(chunk.page_content for chunk in batch))
+        unique_values = await asyncio.to_thread(embeddings.embed_documents, unique_texts)
+        value_by_text = dict(zip(unique_texts, unique_values))
+        values = [value_by_text[chunk.page_content] for chunk in batch]
+        # Same record layout as PineconeVectorStore: the chunk text lives under the "text" metadata key
+        vectors = [
+            {
+                "id": vector_id,
+                "values": vector,
+                "metadata": {**chunk.metadata, "text": chunk.page_content},
+            }
+            for vector_id, vector, chunk in zip(ids[start:], values, batch)
+        ]
+        for offset in range(0, len(vectors), UPSERT_BATCH_SIZE):
+            upserts.append(
+                asyncio.create_task(upsert(vectors[offset : offset + UPSERT_BATCH_SIZE]))
+            )
+    await asyncio.gather(*upserts)
 
 
 def delete_documents_by_source(source):
-    """Delete embeddings from vector store based on source path."""
-    index.delete(filter={"source_path": source})
+    """Delete embeddings from vector store based on the source they were ingested from."""
+    delete_documents_by_sources([source])
+
+
+def delete_documents_by_sources(sources):
+    """Delete the embeddings of several sources, packing their IDs into as few delete requests as possible."""
+    index = get_index()
+    ids = []
+    for source in sources:
+        # list() pages through the IDs sharing the source prefix, so each delete touches only that source's chunks
+        for page in index.list(prefix=_vector_id_prefix(source)):
+            ids.extend(page)
+            while len(ids) >= PINECONE_DELETE_BATCH_SIZE:
+                index.delete(ids=ids[:PINECONE_DELETE_BATCH_SIZE])
+                ids = ids[PINECONE_DELETE_BATCH_SIZE:]
+    if ids:
+        index.delete(ids=ids)
+
+    for source in sources:
+        answer_cache.invalidate_source(source)
 
 
 def clear_vectorstore():
     """Clear all documents from the vector store"""
-    index.delete(delete_all=True)
+    get_index().delete(delete_all=True)
+    answer_cache.clear()
+
+
+def close_embedding_cache():
+    """Close the embedding cache database so its file can be removed."""
+    # Nothing to close if the model was never loaded
+    if get_embeddings.cache_info().currsize == 0:
+        return
+    embeddings = get_embeddings()
+    if isinstance(embeddings, CachedEmbedder):
+        embeddings.close()
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+import numpy as np
+from config import settings
+
+
+class SemanticAnswerCache:
+    """
+    LRU + TTL cache of RAG answers keyed by the embedding of the question.
+
+    A question whose embedding has cosine similarity >= `threshold` with a cached
+    question gets the cached answer back, skipping both the vector search and the
+    LLM call. OpenAI embeddings are L2-normalized, so cosine similarity is a plain
+    dot product.
+    """
+
+    def __init__(self, threshold: float, capacity: int, ttl_seconds: float):
+        """
+        Initialize the answer cache.
+
+        Args:
+            threshold: Minimum cosine similarity for a cached answer to be reused
+            capacity: Maximum number of cached answers
+            ttl_seconds: Age after which a cached answer is dropped
+        """
+        self.threshold = threshold
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # question -> (embedding, result, created at)
+        self._lock = threading.Lock()
+
+    def lookup(self, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """
+        Find the cached result for the closest question above the threshold.
+
+        Args:
+            embedding: Embedding of the incoming question
+
+        Returns:
+            The cached result, or None on a miss
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._evict_expired()
+            if not self._entries:
+                return None
+
+            questions = list(self._entries)
+            matrix = np.stack([self._entries[question][0] for question in questions])
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+
+            self._entries.move_to_end(questions[best])
+            return self._entries[questions[best]][1]
+
+    def add(self, question: str, embedding: List[float], result: Dict[str, Any]) -> None:
+        """
+        Cache the result for a question.
+
+        Args:
+            question: Question text
+            embedding: Embedding of the question
+            result: Result returned by RAGChain for the question
+        """
+        with self._lock:
+            self._entries[question] = (
+                np.asarray(embedding, dtype=np.float32),
+                result,
+                time.monotonic(),
+            )
+            self._entries.move_to_end(question)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached answer."""
+        with self._lock:
+            self._entries.clear()
+
+    def _evict_expired(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        for question in [
+            question
+            for question, (_, _, created_at) in self._entries.items()
+            if created_at < cutoff
+        ]:
+            del self._entries[question]
+
+
+# One cache per resource, shared by every session chatting with it
+_answer_caches: Dict[UUID, SemanticAnswerCache] = {}
+_answer_caches_lock = threading.Lock()
+
+
+def get_answer_cache(resource_id: UUID) -> SemanticAnswerCache:
+    """
+    Get the answer cache for a resource, creating it on first use.
+
+    Args:
+        resource_id: UUID
+
+    Returns:
+        The resource's SemanticAnswerCache
+    """
+    with _answer_caches_lock:
+        if resource_id not in _answer_caches:
+            _answer_caches[resource_id] = SemanticAnswerCache(
+                threshold=settings.ANSWER_CACHE_THRESHOLD,
+                capacity=settings.ANSWER_CACHE_CAPACITY,
+                ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            )
+        return _answer_caches[resource_id]
+
+
+def invalidate_answer_cache(resource_id: UUID) -> None:
+    """
+    Drop a resource's cached answers, e.g. after new documents are stored.
+
+    Args:
+        resource_id: UUID
+    """
+    with _answer_caches_lock:
+        cache = _answer_caches.get(resource_id)
+    if cache is not None:
+        cache.clear()
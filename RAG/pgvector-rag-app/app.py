@@ -2,11 +2,15 @@
 # uv run streamlit run app.py 
 
 import streamlit as st
+import logging
 import uuid
 import tempfile
+import shutil
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Iterable, List
+from config import settings
 
 # Import existing RAG components
 from rag_chain import RAGChain
@@ -20,12 +24,25 @@ from tools.chunking_tools import TextChunkingTool
 from langchain_core.documents import Document
 
 
+logging.basicConfig(
+    level=settings.LOG_LEVEL,
+    format="[%(name)s] %(levelname)s %(message)s",
+)
+
+
 # Cache heavy resources so they persist across reruns
 @st.cache_resource(show_spinner=False)
 def get_vector_service():
     return VectorService()
 
 
+@st.cache_resource(show_spinner=False)
+def get_ingest_pool():
+    # Ingestion runs off the script thread so the UI stays responsive while large files
+    # are processed; one pool for the whole server keeps the worker limit across sessions
+    return ThreadPoolExecutor(max_workers=2)
+
+
 @st.cache_resource(show_spinner=False)
 def get_tools():
     return (
@@ -34,7 +51,8 @@ def get_tools():
         TextExtractionTool(),
         CSVExtractionTool(),
         ExcelExtractionTool(),
-        TextChunkingTool(),
+        # Same chunks as the stock recursive splitter, found with fewer passes over the text
+        TextChunkingTool(fast_splitter=True),
     )
 
 
@@ -68,8 +86,27 @@ class StreamlitRAGApp:
             "markdown": [".md", ".markdown"],
         }
 
+        # Extension lookups, built once so dispatch is a single dict access
+        extractors = {
+            "pdf": self.pdf_tool.extract_text,
+            "docx": self.docx_tool.extract_text,
+            "excel": self.excel_tool.extract_text,
+            "text": self.text_tool.extract_text,
+            "csv": self.csv_tool.extract_text,
+            "markdown": self.text_tool.extract_markdown,
+        }
+        self._ext_to_type = {
+            ext: file_type
+            for file_type, exts in self.supported_file_types.items()
+            for ext in exts
+        }
+        self._ext_to_extractor = {
+            ext: extractors[file_type] for ext, file_type in self._ext_to_type.items()
+        }
+
         # Use hardcoded resource ID
         self.resource_id = "123e4567-e89b-12d3-a456-426614174000"
+        self.resource_uuid = uuid.UUID(self.resource_id)
 
         # Initialize session state
         if "chat_history" not in st.session_state:
@@ -92,78 +129,90 @@ class StreamlitRAGApp:
         """Get file extension from filename."""
         return Path(filename).suffix.lower()
 
-    def _extract_documents(self, uploaded_file, file_extension) -> List[Document]:
-        """Extract documents from uploaded file based on file type."""
-
-        # Store the original filename before converting to bytes
-        original_filename = uploaded_file.name
-
-        # Create temporary file
+    def _save_upload(self, uploaded_file, file_extension) -> str:
+        """Copy an uploaded file to a temporary file and return its path."""
+        # Copy the upload to a temporary file in 1 MiB pieces rather than as one full-size bytes copy
+        uploaded_file.seek(0)
         with tempfile.NamedTemporaryFile(
             delete=False, suffix=file_extension
         ) as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            tmp_file_path = tmp_file.name
-
-        try:
-            documents = []
-
-            if file_extension in self.supported_file_types["pdf"]:
-                documents = self.pdf_tool.extract_text(tmp_file_path, original_filename)
-            elif file_extension in self.supported_file_types["docx"]:
-                documents = self.docx_tool.extract_text(
-                    tmp_file_path, original_filename
-                )
-            elif file_extension in self.supported_file_types["text"]:
-                documents = self.text_tool.extract_text(
-                    tmp_file_path, original_filename
-                )
-            elif file_extension in self.supported_file_types["markdown"]:
-                documents = self.text_tool.extract_markdown(
-                    tmp_file_path, original_filename
-                )
-            elif file_extension in self.supported_file_types["csv"]:
-                documents = self.csv_tool.extract_text(tmp_file_path, original_filename)
-            elif file_extension in self.supported_file_types["excel"]:
-                documents = self.excel_tool.extract_text(
-                    tmp_file_path, original_filename
-                )
-            else:
-                st.error(f"Unsupported file type: {file_extension}")
-                return []
+            shutil.copyfileobj(uploaded_file, tmp_file, length=1 << 20)
+            return tmp_file.name
+
+    def _extract_documents(
+        self, file_path: str, file_extension: str, original_filename: str
+    ) -> List[Document]:
+        """Extract documents from a saved upload based on file type."""
+        extract = self._ext_to_extractor.get(file_extension)
+        if extract is None:
+            raise ValueError(f"Unsupported file type: {file_extension}")
+        return extract(file_path, original_filename)
+
+    def _iter_document_batches(
+        self, file_path: str, file_extension: str, original_filename: str
+    ) -> Iterable[List[Document]]:
+        """Extract documents from a saved upload as batches, streaming CSVs batch by batch."""
+        if file_extension in self.supported_file_types["csv"]:
+            return self.csv_tool.extract_csv_iter(file_path, original_filename)
+        return [self._extract_documents(file_path, file_extension, original_filename)]
+
+    def _ingest_pipeline(
+        self, file_path: str, file_extension: str, original_filename: str
+    ) -> int:
+        """
+        Extract, chunk and store a saved upload, then delete it.
 
-            return documents
+        Runs on the get_ingest_pool() pool, so it must not touch any Streamlit
+        objects; errors are raised for the script thread to report.
 
+        Returns:
+            Number of documents extracted from the file
+        """
+        try:
+            # Each batch is chunked and stored before the next is extracted;
+            # chunk_index keeps counting across the batches of one file
+            document_count = 0
+            chunk_count = 0
+            for documents in self._iter_document_batches(
+                file_path, file_extension, original_filename
+            ):
+                if documents:
+                    chunk_count += self._chunk_and_store_documents(
+                        documents, file_extension, chunk_count
+                    )
+                document_count += len(documents)
+            return document_count
         finally:
             # Clean up temporary file
-            if os.path.exists(tmp_file_path):
-                os.unlink(tmp_file_path)
+            try:
+                os.unlink(file_path)
+            except FileNotFoundError:
+                pass
 
     def _get_file_type(self, file_extension: str) -> str:
         """Get file type from file extension."""
-        for file_type, exts in self.supported_file_types.items():
-            if file_extension in exts:
-                return file_type
-        return "text"
+        return self._ext_to_type.get(file_extension, "text")
 
     def _chunk_and_store_documents(
-        self, documents: List[Document], file_extension: str
-    ):
-        """Process documents and store them in the vector database."""
+        self, documents: List[Document], file_extension: str, start_index: int = 0
+    ) -> int:
+        """Process documents and store them in the vector database, returning the chunk count."""
         if not documents:
-            return
+            return 0
 
         try:
             # Split documents into chunks
             file_type = self._get_file_type(file_extension)
-            chunks = self.chunking_tool.adaptive_chunk(documents, file_type)
+            chunks = self.chunking_tool.adaptive_chunk(
+                documents, file_type, start_index=start_index
+            )
 
             # Store in vector database
-            resource_uuid = uuid.UUID(self.resource_id)
-            self.vector_service.store_documents(chunks, resource_uuid)
+            self.vector_service.store_documents(chunks, self.resource_uuid)
+            return len(chunks)
 
         except Exception as e:
-            st.error(f"❌ Failed to process and store documents: {str(e)}")
+            raise RuntimeError(f"Failed to process and store documents: {str(e)}")
 
     def render_document_upload_tab(self):
         """Render the document upload tab."""
@@ -194,35 +243,64 @@ class StreamlitRAGApp:
             help="Select a file (in a supported format) to upload and add to your knowledge base.",
         )
 
-        if uploaded_file:
-            # Check if processing is already happening
-            if "processing_documents" not in st.session_state:
-                st.session_state.processing_documents = False
+        ingest_future = st.session_state.get("ingest_future")
 
-            # Process directly on click; avoid reruns so spinner stays visible
+        if uploaded_file:
+            # Ingestion runs in the background, so only one file per session is in flight at a time
             if st.button(
                 "🚀 Ingest File",
                 type="primary",
-                disabled=st.session_state.processing_documents,
+                disabled=ingest_future is not None,
             ):
-                st.session_state.processing_documents = True
+                file_extension = self._get_file_extension(uploaded_file.name)
+                tmp_file_path = self._save_upload(uploaded_file, file_extension)
+                st.session_state.ingest_file_name = uploaded_file.name
+                st.session_state.ingest_future = get_ingest_pool().submit(
+                    self._ingest_pipeline,
+                    tmp_file_path,
+                    file_extension,
+                    uploaded_file.name,
+                )
+                # The button was already drawn enabled in this run; rerun once so it renders disabled
                 st.rerun()
 
-            if st.session_state.processing_documents:
-                with st.spinner("Processing documents..."):
-                    st.write(f"📄 Processing: {uploaded_file.name}")
-                    try:
-                        file_extension = self._get_file_extension(uploaded_file.name)
-                        documents = self._extract_documents(
-                            uploaded_file, file_extension
-                        )
-                        if documents:
-                            self._chunk_and_store_documents(documents, file_extension)
-                    except Exception as e:
-                        st.error(f"❌ Failed to process {uploaded_file.name}: {str(e)}")
-                    finally:
-                        st.session_state.processing_documents = False
-                    st.rerun()
+        if ingest_future is not None:
+            self._render_ingest_status()
+        elif "ingest_result" in st.session_state:
+            level, message = st.session_state.pop("ingest_result")
+            getattr(st, level)(message)
+
+    @st.fragment(run_every=2)
+    def _render_ingest_status(self):
+        """Poll the background ingestion, rerunning only this fragment until it finishes."""
+        ingest_future = st.session_state.get("ingest_future")
+        if ingest_future is None:
+            return
+
+        file_name = st.session_state.ingest_file_name
+        if not ingest_future.done():
+            st.info(f"📄 Processing: {file_name} in the background...")
+            return
+
+        del st.session_state.ingest_future
+        try:
+            if ingest_future.result():
+                st.session_state.ingest_result = (
+                    "success",
+                    f"✅ {file_name} processed and stored successfully!",
+                )
+            else:
+                st.session_state.ingest_result = (
+                    "warning",
+                    f"⚠️ No content found in {file_name}",
+                )
+        except Exception as e:
+            st.session_state.ingest_result = (
+                "error",
+                f"❌ Failed to process {file_name}: {str(e)}",
+            )
+        # One full rerun to show the outcome and re-enable the ingest button
+        st.rerun()
 
     def render_chat_tab(self):
         """Render the chat interface tab."""
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 import os
 from dotenv import load_dotenv
@@ -10,6 +11,30 @@ class Settings(BaseSettings):
     DATABASE_URL: str = os.getenv("DATABASE_URL")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     MODEL: str = os.getenv("MODEL", "gpt-4o-mini")
+    # Shortened text-embedding-3 vectors (e.g. 512) take a fraction of the storage and scan time
+    EMBEDDING_DIMENSIONS: Optional[int] = (
+        int(os.getenv("EMBEDDING_DIMENSIONS")) if os.getenv("EMBEDDING_DIMENSIONS") else None
+    )
+    # "openai", or "tei" to embed with a local text-embeddings-inference server
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "openai")
+    TEI_URL: str = os.getenv("TEI_URL", "http://localhost:8080")
+    TEI_MODEL: str = os.getenv("TEI_MODEL", "BAAI/bge-small-en-v1.5")
+    # "vector" (float32), or "halfvec" (float16, pgvector 0.7+) to halve table and index size
+    VECTOR_TYPE: str = os.getenv("VECTOR_TYPE", "vector")
+    ANSWER_CACHE_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+    ANSWER_CACHE_CAPACITY: int = int(os.getenv("ANSWER_CACHE_CAPACITY", "256"))
+    ANSWER_CACHE_TTL_SECONDS: float = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "600"))
+    # DEBUG adds character and paragraph totals while chunking (extra passes over every document)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    OCR_CACHE_DIR: str = os.getenv("OCR_CACHE_DIR", ".ocr_cache")
+    OPENAI_MAX_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = int(
+        os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "50")
+    )
+    OPENAI_TIMEOUT_SECONDS: float = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60"))
+    PG_POOL_SIZE: int = int(os.getenv("PG_POOL_SIZE", "20"))
+    PG_MAX_OVERFLOW: int = int(os.getenv("PG_MAX_OVERFLOW", "40"))
+    PG_POOL_RECYCLE_SECONDS: int = int(os.getenv("PG_POOL_RECYCLE_SECONDS", "300"))
 
     class Config:
         case_sensitive = True
@@ -1,6 +1,9 @@
+from typing import Any, Awaitable, Callable, TypeVar
 from langchain_postgres import PGEngine
 from config import settings
 
+T = TypeVar("T")
+
 # Global shared engine instance
 _shared_pg_engine = None
 
@@ -43,8 +46,16 @@ def get_shared_pg_engine() -> PGEngine:
 
             print(f"[ENGINE_SERVICE] Creating PGEngine with psycopg3 driver")
 
-            # Create single PGEngine instance
-            _shared_pg_engine = PGEngine.from_connection_string(url=langchain_url)
+            # Create single PGEngine instance; its one connection pool is shared by every session
+            _shared_pg_engine = PGEngine.from_connection_string(
+                url=langchain_url,
+                pool_size=settings.PG_POOL_SIZE,
+                max_overflow=settings.PG_MAX_OVERFLOW,
+                # Check connections before use and replace them periodically, so
+                # connections dropped by the server or a proxy never reach a query
+                pool_pre_ping=True,
+                pool_recycle=settings.PG_POOL_RECYCLE_SECONDS,
+            )
 
             print("[ENGINE_SERVICE] Successfully created shared PGEngine instance")
 
@@ -64,3 +75,44 @@ def reset_shared_engine():
     global _shared_pg_engine
     _shared_pg_engine = None
     print("[ENGINE_SERVICE] Reset shared engine")
+
+
+# PGEngine keeps its connection pool and event loop private; these two helpers are
+# the only code that reaches into them (checked against langchain-postgres 0.0.15,
+# the version pinned in pyproject.toml), so an upgrade only has to be checked here.
+
+
+async def _with_connection(
+    engine: PGEngine, work: Callable[..., Awaitable[T]], *args: Any
+) -> T:
+    async with engine._pool.connect() as conn:
+        return await work(conn, *args)
+
+
+def run_with_connection(
+    engine: PGEngine, work: Callable[..., Awaitable[T]], *args: Any
+) -> T:
+    """
+    Run work(conn, *args) with a pooled connection on the engine's event loop.
+
+    Blocks until it finishes. Use for SQL the vector store API does not cover;
+    the engine's connections are bound to its own loop.
+
+    Args:
+        engine: Engine whose pool and loop to use
+        work: Coroutine function taking an AsyncConnection first
+        *args: Further arguments for work
+
+    Returns:
+        The result of work
+    """
+    return engine._run_as_sync(_with_connection(engine, work, *args))
+
+
+async def arun_with_connection(
+    engine: PGEngine, work: Callable[..., Awaitable[T]], *args: Any
+) -> T:
+    """
+    Async version of run_with_connection, for callers on another event loop.
+    """
+    return await engine._run_as_async(_with_connection(engine, work, *args))
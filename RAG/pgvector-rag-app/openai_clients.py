@@ -0,0 +1,41 @@
+from functools import lru_cache
+import httpx
+from config import settings
+
+
+@lru_cache(maxsize=1)
+def get_http_client() -> httpx.Client:
+    """
+    Get the HTTP client shared by every synchronous OpenAI call.
+
+    Chat and embedding requests go through one keep-alive pool, so concurrent
+    sessions reuse open TLS connections instead of each setting up their own.
+    There is no shared async counterpart: async calls run under short-lived
+    asyncio.run loops, and pooled async connections cannot outlive their loop
+    (see create_async_http_client).
+
+    Returns:
+        Shared httpx.Client
+    """
+    return httpx.Client(limits=_limits(), timeout=settings.OPENAI_TIMEOUT_SECONDS)
+
+
+def create_async_http_client() -> httpx.AsyncClient:
+    """
+    Create an async HTTP client for OpenAI calls made on one event loop.
+
+    The client's pooled connections belong to the loop that opened them, so
+    create one per asyncio.run and close it (async with) before the loop ends.
+
+    Returns:
+        New httpx.AsyncClient with the same limits as the shared sync client
+    """
+    return httpx.AsyncClient(limits=_limits(), timeout=settings.OPENAI_TIMEOUT_SECONDS)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    )
+
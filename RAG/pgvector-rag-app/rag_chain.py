@@ -1,14 +1,66 @@
-from typing import Any, Dict
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from uuid import UUID
+from openai import OpenAI
 from langchain_openai import ChatOpenAI
 from langchain.memory import ConversationBufferMemory
 from langchain.chains import ConversationalRetrievalChain
-from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
+from langchain_core.embeddings import Embeddings
 from vector_service import VectorService
+from answer_cache import get_answer_cache
+from openai_clients import create_async_http_client, get_http_client
 from config import settings
 
 
+# Create a system message that includes the context
+SYSTEM_MESSAGE = """
+        You are a helpful AI assistant. Use the following pieces of context to answer the question at the end. 
+        If you don't know the answer, just say that you don't know, don't try to make up an answer
+    
+
+        Use the following pieces of context to answer the user's question. 
+        ----------------
+        {context}
+        """
+
+# Create the prompt template using ChatPromptTemplate
+RAG_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", SYSTEM_MESSAGE),
+        ("human", "{question}"),
+    ]
+)
+
+
+# Concurrent chain calls per aquery_batch, to stay within OpenAI rate limits
+BATCH_QUERY_CONCURRENCY = 20
+
+# Seconds between status checks while an offline batch job runs
+BATCH_POLL_SECONDS = 30
+
+
+@lru_cache(maxsize=1)
+def get_llm() -> ChatOpenAI:
+    """Shared chat model; its pooled HTTP client is reused by every RAG chain."""
+    return _create_llm()
+
+
+def _create_llm(http_async_client=None) -> ChatOpenAI:
+    """Create the chat model, optionally bound to an async HTTP client."""
+    return ChatOpenAI(
+        model=settings.MODEL,
+        streaming=True,
+        openai_api_key=settings.OPENAI_API_KEY,
+        http_client=get_http_client(),
+        http_async_client=http_async_client,
+    )
+
+
 class RAGChain:
     """Complete RAG system implementation using LangChain, pgvector, and OpenAI."""
 
@@ -24,14 +76,14 @@ class RAGChain:
         self.vector_service = vector_service
 
         # Initialize LLM with streaming support
-        self.llm = ChatOpenAI(
-            model=settings.MODEL, streaming=True, openai_api_key=settings.OPENAI_API_KEY
-        )
+        self.llm = get_llm()
 
         # Create project-specific retriever using existing VectorService
+        # MMR over the 20 nearest chunks keeps 6 that are relevant but not near-duplicates
         self.retriever = self.vector_service.create_retriever(
             resource_id=resource_id,
-            search_kwargs={"k": 10},  # Retrieve top 10 relevant chunks
+            search_type="mmr",
+            search_kwargs={"k": 6, "fetch_k": 20, "lambda_mult": 0.5},
         )
 
         # set up the conversation memory for the chat with explicit output key
@@ -39,38 +91,26 @@ class RAGChain:
             memory_key="chat_history", return_messages=True, output_key="answer"
         )
 
+        # Near-duplicate opening questions are answered from this cache
+        self.answer_cache = get_answer_cache(resource_id)
+
         # Build the RAG chain
-        self.chain = self._build_rag_chain()
+        self.chain = self._build_rag_chain(self.memory)
 
-    def _build_rag_chain(self):
+    def _build_rag_chain(
+        self,
+        memory: Optional[ConversationBufferMemory],
+        llm: Optional[ChatOpenAI] = None,
+    ):
         """Build the RAG chain following LangChain patterns."""
 
-        # Create a system message that includes the context
-        system_message = """
-        You are a helpful AI assistant. Use the following pieces of context to answer the question at the end. 
-        If you don't know the answer, just say that you don't know, don't try to make up an answer
-    
-
-        Use the following pieces of context to answer the user's question. 
-        ----------------
-        {context}
-        """
-
-        # Create the prompt template using ChatPromptTemplate
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", system_message),
-                ("human", "{question}"),
-            ]
-        )
-
         # set up the conversation chain with memory handling
         rag_chain = ConversationalRetrievalChain.from_llm(
-            llm=self.llm,
+            llm=llm or self.llm,
             retriever=self.retriever,
-            memory=self.memory,
+            memory=memory,
             return_source_documents=True,
-            combine_docs_chain_kwargs={"prompt": prompt},
+            combine_docs_chain_kwargs={"prompt": RAG_PROMPT},
         )
 
         return rag_chain
@@ -78,24 +118,229 @@ class RAGChain:
     def query_documents(self, message: str) -> Dict[str, Any]:
         """Query the documents using this RAG chain instance."""
         try:
+            embedding = None
+            if self._is_first_turn():
+                embedding = self.vector_service.embeddings.embed_query(message)
+                cached = self._use_cached_answer(embedding, message)
+                if cached is not None:
+                    return cached
+
             response = self.chain.invoke({"question": message})
-            answer = response.get("answer", "")
-            source_documents = response.get("source_documents", [])
-
-            # Format source documents
-            sources = []
-            for doc in source_documents:
-                sources.append({
-                    "content": doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content,
-                    "metadata": doc.metadata
-                })
-
-            return {
-                "answer": answer,
-                "sources": sources,
-                "resource_id": self.resource_id,
-                "question": message,
-                "document_count": len(source_documents),
-            }
+            result = self._format_response(response, message)
+            if embedding is not None:
+                self.answer_cache.add(message, embedding, result)
+            return result
         except Exception as e:
             return f"I encountered an error: {str(e)}. Please try again."
+
+    @asynccontextmanager
+    async def _loop_clients(
+        self, memory: Optional[ConversationBufferMemory]
+    ) -> AsyncIterator[Tuple[ConversationalRetrievalChain, Embeddings]]:
+        """
+        Yield a chain and embeddings client whose async calls belong to the running loop.
+
+        The shared chat model and embeddings keep their async connections on the
+        first event loop that used them, so every asyncio.run gets its own
+        clients, closed when the block exits.
+
+        Args:
+            memory: Conversation memory of the chain (None for a memoryless chain)
+
+        Yields:
+            (chain, embeddings) for the running loop
+        """
+        async with create_async_http_client() as http_async_client:
+            async with self.vector_service.embedding_tool.loop_embeddings() as embeddings:
+                yield self._build_rag_chain(memory, _create_llm(http_async_client)), embeddings
+
+    async def aquery_documents(self, message: str) -> Dict[str, Any]:
+        """Query the documents asynchronously, so concurrent questions overlap their I/O."""
+        try:
+            async with self._loop_clients(self.memory) as (chain, embeddings):
+                embedding = None
+                if self._is_first_turn():
+                    embedding = await embeddings.aembed_query(message)
+                    cached = self._use_cached_answer(embedding, message)
+                    if cached is not None:
+                        return cached
+
+                response = await chain.ainvoke({"question": message})
+                result = self._format_response(response, message)
+                if embedding is not None:
+                    self.answer_cache.add(message, embedding, result)
+                return result
+        except Exception as e:
+            return f"I encountered an error: {str(e)}. Please try again."
+
+    async def aquery_batch(self, messages: List[str]) -> List[Dict[str, Any]]:
+        """
+        Answer independent single-turn questions concurrently.
+
+        Questions are answered without chat history and are not recorded in
+        this chain's conversation memory, so they can run in parallel.
+
+        Args:
+            messages: Questions to answer
+
+        Returns:
+            Results in the same order as the questions
+        """
+        semaphore = asyncio.Semaphore(BATCH_QUERY_CONCURRENCY)
+
+        async with self._loop_clients(None) as (chain, embeddings):
+
+            async def answer(message: str) -> Dict[str, Any]:
+                async with semaphore:
+                    return await self._aquery_stateless(message, chain, embeddings)
+
+            return await asyncio.gather(*(answer(message) for message in messages))
+
+    async def _aquery_stateless(
+        self,
+        message: str,
+        chain: ConversationalRetrievalChain,
+        embeddings: Embeddings,
+    ) -> Dict[str, Any]:
+        """Answer one question with an empty chat history, using the answer cache."""
+        try:
+            embedding = await embeddings.aembed_query(message)
+            cached = self.answer_cache.lookup(embedding)
+            if cached is not None:
+                return {**cached, "question": message}
+
+            response = await chain.ainvoke({"question": message, "chat_history": []})
+            result = self._format_response(response, message)
+            self.answer_cache.add(message, embedding, result)
+            return result
+        except Exception as e:
+            return f"I encountered an error: {str(e)}. Please try again."
+
+    def batch_query_documents(self, messages: List[str]) -> List[Dict[str, Any]]:
+        """
+        Answer independent questions offline through the OpenAI Batch API.
+
+        Meant for non-interactive workloads such as evaluation runs: contexts are
+        retrieved for every question up front, the prompts are submitted as one
+        batch job at the discounted batch rate, and this call blocks until the
+        job finishes (up to its 24h completion window).
+
+        Args:
+            messages: Questions to answer
+
+        Returns:
+            Results in the same order as the questions
+
+        Raises:
+            RuntimeError: If the batch job fails, expires or is cancelled
+        """
+        if not messages:
+            return []
+
+        source_documents = self.retriever.batch(messages)
+
+        lines = []
+        for i, (message, docs) in enumerate(zip(messages, source_documents)):
+            context = "\n\n".join(doc.page_content for doc in docs)
+            lines.append(
+                json.dumps(
+                    {
+                        "custom_id": str(i),
+                        "method": "POST",
+                        "url": "/v1/chat/completions",
+                        "body": {
+                            "model": settings.MODEL,
+                            "messages": [
+                                {
+                                    "role": "system",
+                                    "content": SYSTEM_MESSAGE.format(context=context),
+                                },
+                                {"role": "user", "content": message},
+                            ],
+                        },
+                    }
+                )
+            )
+
+        client = OpenAI(api_key=settings.OPENAI_API_KEY, http_client=get_http_client())
+        input_file = client.files.create(
+            file=("questions.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        print(f"[RAG_CHAIN] Submitted batch {batch.id} with {len(messages)} questions")
+
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(BATCH_POLL_SECONDS)
+            batch = client.batches.retrieve(batch.id)
+        if batch.status != "completed":
+            raise RuntimeError(f"Batch {batch.id} ended with status '{batch.status}'")
+
+        answers = {}
+        if batch.output_file_id:
+            for line in client.files.content(batch.output_file_id).text.splitlines():
+                output = json.loads(line)
+                body = (output.get("response") or {}).get("body") or {}
+                if body.get("choices"):
+                    answers[output["custom_id"]] = body["choices"][0]["message"]["content"]
+
+        results = []
+        for i, (message, docs) in enumerate(zip(messages, source_documents)):
+            if str(i) in answers:
+                results.append(
+                    self._format_response(
+                        {"answer": answers[str(i)], "source_documents": docs}, message
+                    )
+                )
+            else:
+                results.append(
+                    "I encountered an error: no batch answer for this question. Please try again."
+                )
+        return results
+
+    def _is_first_turn(self) -> bool:
+        """
+        Check whether the conversation memory is empty.
+
+        Follow-up questions are condensed with the chat history, so only
+        opening questions are answered from or added to the cache.
+        """
+        return not self.memory.chat_memory.messages
+
+    def _use_cached_answer(
+        self, embedding: List[float], message: str
+    ) -> Optional[Dict[str, Any]]:
+        """Return the cached result for a question, recording the exchange in memory, or None."""
+        cached = self.answer_cache.lookup(embedding)
+        if cached is None:
+            return None
+
+        print(f"[RAG_CHAIN] Answer cache hit for question: {message}")
+        # Keep the memory consistent with what the user saw, so follow-ups have context
+        self.memory.save_context({"question": message}, {"answer": cached["answer"]})
+        return {**cached, "question": message}
+
+    def _format_response(self, response: Dict[str, Any], message: str) -> Dict[str, Any]:
+        """Shape a chain response into the answer dict returned to callers."""
+        answer = response.get("answer", "")
+        source_documents = response.get("source_documents", [])
+
+        # Format source documents
+        sources = []
+        for doc in source_documents:
+            sources.append({
+                "content": doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content,
+                "metadata": doc.metadata
+            })
+
+        return {
+            "answer": answer,
+            "sources": sources,
+            "resource_id": self.resource_id,
+            "question": message,
+            "document_count": len(source_documents),
+        }
@@ -1,24 +1,170 @@
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 from typing import List
 from langchain_core.documents import Document
-from langchain_text_splitters import (
-    RecursiveCharacterTextSplitter,
-    CharacterTextSplitter,
-)
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+logger = logging.getLogger(__name__)
+
+
+# Document sets at least this large are split across worker processes
+PARALLEL_CHUNKING_MIN_DOCS = 200
+
+
+def _split_shard(splitter, documents: List[Document]) -> List[Document]:
+    return splitter.split_documents(documents)
+
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """
+    Return the worker pool shared by every chunking call, starting it on first use.
+
+    Spawned workers re-import langchain, so the pool is kept for the life of the
+    process rather than started per call (a streamed CSV chunks many batches).
+    Spawn rather than fork: the app process runs background threads (PGEngine
+    loop, ingest pool).
+
+    Returns:
+        Shared ProcessPoolExecutor
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+class FastRecursiveSplitter(RecursiveCharacterTextSplitter):
+    """
+    RecursiveCharacterTextSplitter that scans the text at most once per separator.
+
+    The stock splitter re-searches and re-splits every oversized piece with
+    regexes as it recurses. This one records where each separator occurs in the
+    whole text the first time that level is needed, then recurses over those
+    offsets with bisect, slicing the text only to build the final pieces.
+    Separators are kept at the start of the following piece, as with the stock
+    splitter's default keep_separator=True, and the chunks produced are the same.
+    """
+
+    def __init__(self, separators: List[str], **kwargs):
+        """
+        Initialize the splitter.
+
+        Args:
+            separators: Literal separators, coarsest first; a trailing "" allows
+                        splitting into single characters as a last resort
+            **kwargs: Passed to RecursiveCharacterTextSplitter
+        """
+        super().__init__(
+            separators=separators, keep_separator=True, is_separator_regex=False, **kwargs
+        )
+        self._separator_res = [re.compile(re.escape(sep)) for sep in separators if sep]
+        self._split_chars = "" in separators
+
+    def split_text(self, text: str) -> List[str]:
+        """
+        Split text into chunks.
+
+        Args:
+            text: Text to split
+
+        Returns:
+            List of chunks
+        """
+        # Separator start offsets per level, filled in on first use
+        starts = [None] * len(self._separator_res)
+        return self._split_range(text, 0, len(text), 0, starts)
+
+    def _level_starts(self, text: str, level: int, starts: list) -> List[int]:
+        if starts[level] is None:
+            starts[level] = [
+                match.start() for match in self._separator_res[level].finditer(text)
+            ]
+        return starts[level]
+
+    def _split_range(
+        self, text: str, lo: int, hi: int, level: int, starts: list
+    ) -> List[str]:
+        """Split text[lo:hi] on the first separator, from `level` on, that occurs in it."""
+        cuts = None
+        next_level = None
+        for candidate in range(level, len(starts)):
+            level_starts = self._level_starts(text, candidate, starts)
+            first = bisect_left(level_starts, lo)
+            last = bisect_left(level_starts, hi)
+            if first < last:
+                # A separator at lo stays attached to the first piece
+                if level_starts[first] == lo:
+                    first += 1
+                cuts = level_starts[first:last]
+                next_level = candidate + 1
+                break
+
+        if cuts is None:
+            if not self._split_chars:
+                return [text[lo:hi]]
+            cuts = range(lo + 1, hi)
+
+        recurse = next_level is not None and (
+            next_level < len(starts) or self._split_chars
+        )
+        final_chunks = []
+        good_splits = []
+        bounds = [lo, *cuts, hi]
+        for piece_start, piece_end in zip(bounds, bounds[1:]):
+            piece = text[piece_start:piece_end]
+            if self._length_function(piece) < self._chunk_size:
+                good_splits.append(piece)
+                continue
+            if good_splits:
+                final_chunks.extend(self._merge_splits(good_splits, ""))
+                good_splits = []
+            if recurse:
+                final_chunks.extend(
+                    self._split_range(text, piece_start, piece_end, next_level, starts)
+                )
+            else:
+                final_chunks.append(piece)
+        if good_splits:
+            final_chunks.extend(self._merge_splits(good_splits, ""))
+        return final_chunks
 
 
 class TextChunkingTool:
     """Tool for chunking documents using various strategies."""
 
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        fast_splitter: bool = False,
+    ):
         """
         Initialize the chunking tool.
 
         Args:
             chunk_size: Maximum size of each chunk
             chunk_overlap: Number of characters to overlap between chunks
+            fast_splitter: Use FastRecursiveSplitter, which scans the text at most
+                           once per separator, instead of RecursiveCharacterTextSplitter
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.fast_splitter = fast_splitter
 
         # Language-specific separators for better chunking
         self.language_separators = {
@@ -32,16 +178,81 @@ class TextChunkingTool:
             "default": ["\n\n", "\n", ". ", "! ", "? ", "; ", ", ", " ", ""],
         }
 
-        self.recursive_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
+        self.recursive_splitter = self._build_splitter(self.language_separators["default"])
+
+        # Language-specific splitters, built on first use and reused for later documents
+        self._language_splitters = {}
+
+    def _get_language_splitter(self, language: str) -> RecursiveCharacterTextSplitter:
+        """Return the recursive splitter for a language, building it on first use."""
+        if language not in self._language_splitters:
+            self._language_splitters[language] = self._build_splitter(
+                self.language_separators[language]
+            )
+        return self._language_splitters[language]
+
+    def _build_splitter(self, separators: List[str]) -> RecursiveCharacterTextSplitter:
+        """Build a recursive splitter over the given separators."""
+        if self.fast_splitter:
+            return FastRecursiveSplitter(
+                separators=separators,
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                length_function=len,
+            )
+        return RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
             length_function=len,
             is_separator_regex=False,
-            separators=self.language_separators["default"],
+            separators=separators,
+        )
+
+    def _chunk_metadata(self, chunking_method: str, detected_language: str) -> dict:
+        """Metadata shared by every chunk of one chunking call."""
+        return {
+            "chunking_method": chunking_method,
+            "original_chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "detected_language": detected_language or "unknown",
+            "language_aware_chunking": detected_language is not None,
+        }
+
+    def _split_documents(self, splitter, documents: List[Document]) -> List[Document]:
+        """
+        Split documents with the given splitter, sharding large sets across CPU cores.
+
+        Args:
+            splitter: Text splitter to apply
+            documents: List of documents to split
+
+        Returns:
+            List of chunks, in document order
+        """
+        if len(documents) < PARALLEL_CHUNKING_MIN_DOCS:
+            return splitter.split_documents(documents)
+
+        # Contiguous shards, one per worker, so concatenating the results keeps document order
+        workers = min(os.cpu_count() or 1, len(documents))
+        shard_size = -(-len(documents) // workers)
+        shards = [
+            documents[start : start + shard_size]
+            for start in range(0, len(documents), shard_size)
+        ]
+        logger.info(
+            "Splitting %s documents across %s processes", len(documents), len(shards)
+        )
+        return list(
+            chain.from_iterable(
+                _get_process_pool().map(_split_shard, [splitter] * len(shards), shards)
+            )
         )
 
     def chunk_documents(
-        self, documents: List[Document], detected_language: str = None
+        self,
+        documents: List[Document],
+        detected_language: str = None,
+        start_index: int = 0,
     ) -> List[Document]:
         """
         Chunk documents using recursive character splitting with language-aware separators.
@@ -49,6 +260,7 @@ class TextChunkingTool:
         Args:
             documents: List of documents to chunk
             detected_language: Detected language for language-specific chunking
+            start_index: chunk_index of the first chunk, for files chunked in batches
 
         Returns:
             List of chunked documents with enhanced metadata
@@ -57,149 +269,129 @@ class TextChunkingTool:
             ValueError: If chunking fails
         """
         try:
-            print(
-                f"[CHUNKING_TOOL] Starting recursive character chunking of {len(documents)} documents (language: {detected_language})"
+            logger.info(
+                "Starting recursive character chunking of %s documents (language: %s)",
+                len(documents),
+                detected_language,
             )
 
             # Create language-specific splitter if language is detected
             if detected_language and detected_language in self.language_separators:
-                print(
-                    f"[CHUNKING_TOOL] Using language-specific separators for {detected_language}"
-                )
-                splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=self.chunk_size,
-                    chunk_overlap=self.chunk_overlap,
-                    length_function=len,
-                    is_separator_regex=False,
-                    separators=self.language_separators[detected_language],
+                logger.info(
+                    "Using language-specific separators for %s", detected_language
                 )
+                splitter = self._get_language_splitter(detected_language)
             else:
-                print(
-                    f"[CHUNKING_TOOL] Using default separators for unknown language: {detected_language}"
+                logger.info(
+                    "Using default separators for unknown language: %s",
+                    detected_language,
                 )
                 splitter = self.recursive_splitter
 
             # DEBUG: Log input document details
-            total_input_chars = sum(len(doc.page_content) for doc in documents)
-            print(f"[CHUNKING_TOOL] Input: {total_input_chars} total characters")
+            if logger.isEnabledFor(logging.DEBUG):
+                total_input_chars = sum(len(doc.page_content) for doc in documents)
+                logger.debug("Input: %s total characters", total_input_chars)
 
-            chunked_docs = splitter.split_documents(documents)
+            chunked_docs = self._split_documents(splitter, documents)
 
-            print(
-                f"[CHUNKING_TOOL] Recursive splitter produced {len(chunked_docs)} chunks"
-            )
+            logger.info("Recursive splitter produced %s chunks", len(chunked_docs))
 
             # DEBUG: Log output details
-            if chunked_docs:
+            if not chunked_docs:
+                logger.warning("Recursive splitter returned no chunks!")
+            elif logger.isEnabledFor(logging.DEBUG):
                 output_chars = sum(len(chunk.page_content) for chunk in chunked_docs)
-                print(
-                    f"[CHUNKING_TOOL] Output: {output_chars} total characters in chunks"
-                )
-            else:
-                print(f"[CHUNKING_TOOL] Recursive splitter returned no chunks!")
+                logger.debug("Output: %s total characters in chunks", output_chars)
 
             # Add chunk metadata including language information
+            base_metadata = self._chunk_metadata("recursive_character", detected_language)
             for i, chunk in enumerate(chunked_docs):
-                chunk.metadata.update(
-                    {
-                        "chunk_index": i,
-                        "chunk_size": len(chunk.page_content),
-                        "chunking_method": "recursive_character",
-                        "original_chunk_size": self.chunk_size,
-                        "chunk_overlap": self.chunk_overlap,
-                        "detected_language": detected_language or "unknown",
-                        "language_aware_chunking": detected_language is not None,
-                    }
-                )
+                chunk.metadata.update(base_metadata)
+                chunk.metadata["chunk_index"] = start_index + i
+                chunk.metadata["chunk_size"] = len(chunk.page_content)
 
             return chunked_docs
 
         except Exception as e:
-            print(f"[CHUNKING_TOOL] Recursive character chunking failed: {str(e)}")
+            logger.error("Recursive character chunking failed: %s", e)
             raise ValueError(
                 f"Failed to chunk documents by recursive character splitting: {str(e)}"
             )
 
     def chunk_by_paragraphs(
-        self, documents: List[Document], detected_language: str = None
+        self,
+        documents: List[Document],
+        detected_language: str = None,
+        start_index: int = 0,
     ) -> List[Document]:
         """
         Chunk documents by paragraphs with size limits.
 
         Args:
             documents: List of documents to chunk
+            detected_language: Detected language for language-specific chunking
+            start_index: chunk_index of the first chunk, for files chunked in batches
 
         Returns:
             List of paragraph-based chunks
         """
         try:
-            print(
-                f"[CHUNKING_TOOL] Starting paragraph-based chunking of {len(documents)} documents (language: {detected_language})"
+            logger.info(
+                "Starting paragraph-based chunking of %s documents (language: %s)",
+                len(documents),
+                detected_language,
             )
 
             # Create language-specific splitter if language is detected
             if detected_language and detected_language in self.language_separators:
-                print(
-                    f"[CHUNKING_TOOL] Using language-specific separators for {detected_language}"
-                )
-                paragraph_splitter = CharacterTextSplitter(
-                    separator="\n\n",
-                    chunk_size=self.chunk_size,
-                    chunk_overlap=self.chunk_overlap,
-                    length_function=len,
-                    separators=self.language_separators[detected_language],
+                logger.info(
+                    "Using language-specific separators for %s", detected_language
                 )
+                paragraph_splitter = self._get_language_splitter(detected_language)
             else:
-                print(
-                    f"[CHUNKING_TOOL] Using default separators for unknown language: {detected_language}"
-                )
-                paragraph_splitter = CharacterTextSplitter(
-                    separator="\n\n",
-                    chunk_size=self.chunk_size,
-                    chunk_overlap=self.chunk_overlap,
-                    length_function=len,
+                logger.info(
+                    "Using default separators for unknown language: %s",
+                    detected_language,
                 )
+                paragraph_splitter = self.recursive_splitter
+            # Every separator list leads with "\n\n", so paragraphs are kept whole and
+            # only paragraphs longer than chunk_size fall back to the finer separators
 
             # DEBUG: Log input document details
-            total_input_chars = sum(len(doc.page_content) for doc in documents)
-            paragraph_count = sum(doc.page_content.count("\n\n") for doc in documents)
-            print(
-                f"[CHUNKING_TOOL] Input: {total_input_chars} total characters, {paragraph_count} paragraph breaks"
-            )
+            if logger.isEnabledFor(logging.DEBUG):
+                total_input_chars = sum(len(doc.page_content) for doc in documents)
+                paragraph_count = sum(
+                    doc.page_content.count("\n\n") for doc in documents
+                )
+                logger.debug(
+                    "Input: %s total characters, %s paragraph breaks",
+                    total_input_chars,
+                    paragraph_count,
+                )
 
-            chunked_docs = paragraph_splitter.split_documents(documents)
+            chunked_docs = self._split_documents(paragraph_splitter, documents)
 
-            print(
-                f"[CHUNKING_TOOL] Paragraph splitter produced {len(chunked_docs)} chunks"
-            )
+            logger.info("Paragraph splitter produced %s chunks", len(chunked_docs))
 
             # DEBUG: Log output details
-            if chunked_docs:
+            if not chunked_docs:
+                logger.warning("Paragraph splitter returned no chunks!")
+            elif logger.isEnabledFor(logging.DEBUG):
                 output_chars = sum(len(chunk.page_content) for chunk in chunked_docs)
-                print(
-                    f"[CHUNKING_TOOL] Output: {output_chars} total characters in chunks"
-                )
-            else:
-                print(f"[CHUNKING_TOOL] Paragraph splitter returned no chunks!")
+                logger.debug("Output: %s total characters in chunks", output_chars)
 
             # Add chunk metadata including language information
+            base_metadata = self._chunk_metadata("paragraph", detected_language)
             for i, chunk in enumerate(chunked_docs):
-                chunk.metadata.update(
-                    {
-                        "chunk_index": i,
-                        "chunk_size": len(chunk.page_content),
-                        "chunking_method": "paragraph",
-                        "original_chunk_size": self.chunk_size,
-                        "chunk_overlap": self.chunk_overlap,
-                        "detected_language": detected_language or "unknown",
-                        "language_aware_chunking": detected_language is not None,
-                    }
-                )
+                chunk.metadata.update(base_metadata)
+                chunk.metadata["chunk_index"] = start_index + i
+                chunk.metadata["chunk_size"] = len(chunk.page_content)
 
             return chunked_docs
 
         except Exception as e:
-            print(f"[CHUNKING_TOOL] Paragraph chunking failed: {str(e)}")
+            logger.error("Paragraph chunking failed: %s", e)
             raise ValueError(f"Failed to chunk documents by paragraphs: {str(e)}")
 
     def adaptive_chunk(
@@ -207,6 +399,7 @@ class TextChunkingTool:
         documents: List[Document],
         content_type: str,
         detected_language: str = None,
+        start_index: int = 0,
     ) -> List[Document]:
         """
         Apply adaptive chunking based on content type and detected language.
@@ -215,39 +408,40 @@ class TextChunkingTool:
             documents: List of documents to chunk
             content_type: Type of content (pdf, docx, excel, text, etc.)
             detected_language: Detected language for language-aware chunking
+            start_index: chunk_index of the first chunk, for files chunked in batches
 
         Returns:
             List of adaptively chunked documents
         """
-        print(
-            f"[CHUNKING_TOOL] Adaptive chunking for content type: '{content_type}', language: '{detected_language}'"
+        logger.info(
+            "Adaptive chunking for content type: '%s', language: '%s'",
+            content_type,
+            detected_language,
         )
 
         # Adjust chunking strategy based on content type
         if content_type == "pdf":
             # PDFs often have better paragraph structure
-            print(f"[CHUNKING_TOOL] Using paragraph chunking for PDF")
-            return self.chunk_by_paragraphs(documents, detected_language)
+            logger.info("Using paragraph chunking for PDF")
+            return self.chunk_by_paragraphs(documents, detected_language, start_index)
         elif content_type == "docx":
             # DOCX files usually have good section breaks
-            print(f"[CHUNKING_TOOL] Using paragraph chunking for DOCX")
-            return self.chunk_by_paragraphs(documents, detected_language)
+            logger.info("Using paragraph chunking for DOCX")
+            return self.chunk_by_paragraphs(documents, detected_language, start_index)
         elif content_type == "excel":
             # Excel models have structured sections (sheets, metrics, analysis)
             # Use paragraph chunking to preserve section boundaries
-            print(f"[CHUNKING_TOOL] Using paragraph chunking for Excel")
-            return self.chunk_by_paragraphs(documents, detected_language)
+            logger.info("Using paragraph chunking for Excel")
+            return self.chunk_by_paragraphs(documents, detected_language, start_index)
         elif content_type == "text":
             # Plain text may need more aggressive splitting
-            print(f"[CHUNKING_TOOL] Using recursive character chunking for text")
-            return self.chunk_documents(documents, detected_language)
+            logger.info("Using recursive character chunking for text")
+            return self.chunk_documents(documents, detected_language, start_index)
         elif content_type == "csv":
             # CSV files may have structured data
-            print(f"[CHUNKING_TOOL] Using paragraph chunking for CSV")
-            return self.chunk_documents(documents, detected_language)
+            logger.info("Using paragraph chunking for CSV")
+            return self.chunk_documents(documents, detected_language, start_index)
         else:
             # Default to recursive splitting
-            print(
-                f"[CHUNKING_TOOL] Using default recursive character chunking for unknown type"
-            )
-            return self.chunk_documents(documents, detected_language)
+            logger.info("Using default recursive character chunking for unknown type")
+            return self.chunk_documents(documents, detected_language, start_index)
@@ -1,9 +1,14 @@
-from typing import List, Optional
+import logging
+import csv
+from itertools import chain, islice
+from typing import Iterator, List, Optional
 from pathlib import Path
-from langchain_community.document_loaders import CSVLoader
 from langchain_core.documents import Document
 
 
+logger = logging.getLogger(__name__)
+
+
 class CSVExtractionTool:
     """Tool for extracting and processing CSV documents."""
 
@@ -12,6 +17,7 @@ class CSVExtractionTool:
         file_path: str,
         original_filename: Optional[str] = None,
         csv_delimiter: str = ",",
+        rows_per_doc: int = 20,
     ) -> List[Document]:
         """
         Extract data from a CSV file.
@@ -20,44 +26,128 @@ class CSVExtractionTool:
             file_path: Path to CSV file (may be temporary)
             original_filename: Original filename from database (optional)
             csv_delimiter: Delimiter used in the CSV (default: ",")
-            encoding: CSV file encoding (auto-detected if None)
+            rows_per_doc: Number of consecutive rows grouped into one document
 
         Returns:
             List of Document objects with content and metadata
         """
+        return list(
+            chain.from_iterable(
+                self.extract_csv_iter(
+                    file_path, original_filename, csv_delimiter, rows_per_doc
+                )
+            )
+        )
+
+    def extract_csv_iter(
+        self,
+        file_path: str,
+        original_filename: Optional[str] = None,
+        csv_delimiter: str = ",",
+        rows_per_doc: int = 20,
+        batch_size: int = 10_000,
+    ) -> Iterator[List[Document]]:
+        """
+        Extract data from a CSV file as a stream of document batches.
+
+        Only one batch is held in memory at a time, so callers that chunk and
+        store each batch before asking for the next can ingest CSVs of any size.
+
+        Args:
+            file_path: Path to CSV file (may be temporary)
+            original_filename: Original filename from database (optional)
+            csv_delimiter: Delimiter used in the CSV (default: ",")
+            rows_per_doc: Number of consecutive rows grouped into one document
+            batch_size: Approximate number of rows per yielded batch
+
+        Yields:
+            Lists of Document objects with content and metadata
+
+        Raises:
+            FileNotFoundError: If the file does not exist
+            ValueError: If the file cannot be read as CSV
+        """
         if not Path(file_path).exists():
             raise FileNotFoundError(f"CSV file not found: {file_path}")
 
+        # Use original filename if provided, otherwise use file path
+        source_filename = (
+            original_filename if original_filename else Path(file_path).name
+        )
+        logger.info("Source filename: %s", source_filename)
+
+        common_metadata = {
+            "file_type": "csv",
+            "file_path": file_path,
+            "source_file": source_filename,
+            "delimiter": csv_delimiter,
+            "extraction_method": "csv.reader",
+        }
+        docs_per_batch = max(1, batch_size // rows_per_doc)
+        total_rows = 0
+        total_docs = 0
         try:
-            loader = CSVLoader(
-                file_path=file_path,
-                csv_args={"delimiter": csv_delimiter},
-            )
-            documents = loader.load()
-            print(
-                f"[CSV_EXTRACTION] Extracted {len(documents)} documents from {file_path}"
-            )
+            with open(file_path, newline="", encoding="utf-8-sig") as f:
+                reader = csv.reader(f, delimiter=csv_delimiter)
+                header = [column.strip() for column in next(reader, [])]
 
-            # Use original filename if provided, otherwise use file path
-            source_filename = (
-                original_filename if original_filename else Path(file_path).name
-            )
-            print(f"[CSV_EXTRACTION] Source filename: {source_filename}")
-
-            # Enhance metadata for each document
-            for doc in documents:
-                doc.metadata.update(
-                    {
-                        "file_type": "csv",
-                        "file_path": file_path,
-                        "source_file": source_filename,
-                        "delimiter": csv_delimiter,
-                        "extraction_method": "CSVLoader",
-                    }
-                )
+                while True:
+                    documents = []
+                    while len(documents) < docs_per_batch:
+                        rows = list(islice(reader, rows_per_doc))
+                        if not rows:
+                            break
+                        documents.append(
+                            self._rows_to_document(header, rows, file_path, total_rows)
+                        )
+                        total_rows += len(rows)
+                    if not documents:
+                        break
 
-            return documents
+                    # Enhance metadata for each document
+                    for doc in documents:
+                        doc.metadata = {**doc.metadata, **common_metadata}
+
+                    total_docs += len(documents)
+                    yield documents
 
         except Exception as e:
-            print(f"[CSV_EXTRACTION] Extraction failed: {str(e)}")
+            logger.error("Extraction failed: %s", e)
             raise ValueError(f"Failed to extract CSV from file: {str(e)}")
+
+        logger.info(
+            "Extracted %s rows into %s documents from %s",
+            total_rows,
+            total_docs,
+            file_path,
+        )
+
+    @staticmethod
+    def _rows_to_document(
+        header: List[str], rows: List[List[str]], file_path: str, first_row: int
+    ) -> Document:
+        """
+        Render a group of rows as "column: value" lines, one blank line between rows.
+
+        Args:
+            header: Column names from the first line of the file
+            rows: Consecutive data rows
+            file_path: Path to the CSV file
+            first_row: Index of the first row in the group
+
+        Returns:
+            Document covering the rows
+        """
+        row_texts = []
+        for row in rows:
+            lines = [
+                f"{column}: {value.strip()}" for column, value in zip(header, row)
+            ]
+            # Values past the header width, as CSVLoader keeps them under a None key
+            lines.extend(f"None: {value.strip()}" for value in row[len(header) :])
+            row_texts.append("\n".join(lines))
+
+        return Document(
+            page_content="\n\n".join(row_texts),
+            metadata={"source": file_path, "row": first_row, "row_count": len(rows)},
+        )
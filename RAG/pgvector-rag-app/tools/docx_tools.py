@@ -1,9 +1,48 @@
-from typing import List
+import logging
+import zipfile
+from typing import Iterator, List
 from pathlib import Path
-from langchain_community.document_loaders.word_document import Docx2txtLoader
+from xml.etree.ElementTree import iterparse
 from langchain_core.documents import Document
 
 
+logger = logging.getLogger(__name__)
+
+# WordprocessingML namespace used by word/document.xml
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def _iter_paragraphs(file_path: str) -> Iterator[str]:
+    """
+    Stream the text of each non-empty paragraph in a DOCX body.
+
+    Parses word/document.xml incrementally and clears each paragraph once read,
+    so memory stays flat however large the document is.
+
+    Args:
+        file_path: Path to DOCX file
+
+    Yields:
+        Paragraph text, in document order
+    """
+    with zipfile.ZipFile(file_path) as archive, archive.open("word/document.xml") as xml:
+        for _, elem in iterparse(xml):
+            if elem.tag != f"{_W}p":
+                continue
+            parts = []
+            for node in elem.iter():
+                if node.tag == f"{_W}t" and node.text:
+                    parts.append(node.text)
+                elif node.tag == f"{_W}tab":
+                    parts.append("\t")
+                elif node.tag in (f"{_W}br", f"{_W}cr"):
+                    parts.append("\n")
+            elem.clear()
+            text = "".join(parts).strip()
+            if text:
+                yield text
+
+
 class DOCXExtractionTool:
     """Tool for extracting text and metadata from DOCX documents."""
 
@@ -11,7 +50,7 @@ class DOCXExtractionTool:
         self, file_path: str, original_filename: str = None
     ) -> List[Document]:
         """
-        Extract text from DOCX file using Docx2txtLoader.
+        Extract text from DOCX file by streaming its paragraphs.
 
         Args:
             file_path: Path to DOCX file (may be temporary)
@@ -28,28 +67,26 @@ class DOCXExtractionTool:
             raise FileNotFoundError(f"DOCX file not found: {file_path}")
 
         try:
-            loader = Docx2txtLoader(file_path)
-            documents = loader.load()
-            print(
-                f"[DOCX_EXTRACTION] Extracted {len(documents)} documents from {file_path}"
-            )
+            # Blank lines between paragraphs so paragraph chunking can split on them
+            content = "\n\n".join(_iter_paragraphs(file_path))
+            documents = [Document(page_content=content, metadata={"source": file_path})]
+            logger.info("Extracted %s documents from %s", len(documents), file_path)
 
             # Use original filename if provided, otherwise use file path
             source_filename = (
                 original_filename if original_filename else Path(file_path).name
             )
-            print(f"[DOCX_EXTRACTION] Source filename: {source_filename}")
+            logger.info("Source filename: %s", source_filename)
 
             # Enhance metadata for each document
+            common_metadata = {
+                "file_type": "docx",
+                "file_path": file_path,
+                "source_file": source_filename,  # Use original filename
+                "extraction_method": "docx_xml_stream",
+            }
             for doc in documents:
-                doc.metadata.update(
-                    {
-                        "file_type": "docx",
-                        "file_path": file_path,
-                        "source_file": source_filename,  # Use original filename
-                        "extraction_method": "Docx2txtLoader",
-                    }
-                )
+                doc.metadata = {**doc.metadata, **common_metadata}
 
             return documents
 
@@ -1,20 +1,55 @@
-from typing import List
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 from config import settings
+from openai_clients import create_async_http_client, get_http_client
 
 
 class EmbeddingGenerationTool:
-    """Tool for generating embeddings using OpenAI models."""
-
-    def __init__(self, model: str = "text-embedding-3-small"):
+    """Tool for generating embeddings using OpenAI models or a local TEI server."""
+
+    def __init__(
+        self,
+        model: str = "text-embedding-3-small",
+        dimensions: Optional[int] = None,
+        backend: str = "openai",
+    ):
         """
-        Initialize the embedding manager with OpenAI embeddings.
+        Initialize the embedding manager.
 
         Args:
-            model: OpenAI embedding model to use (default: text-embedding-3-small)
-                   Options: text-embedding-3-small, text-embedding-3-large, text-embedding-ada-002
+            model: Embedding model to use (default: text-embedding-3-small)
+                   OpenAI options: text-embedding-3-small, text-embedding-3-large, text-embedding-ada-002
+                   For the "tei" backend, the model served by the TEI server (used for labelling)
+            dimensions: Shortened output size for text-embedding-3 models
+                        (default: the model's full size)
+            backend: "openai", or "tei" for a Hugging Face text-embeddings-inference
+                     server at settings.TEI_URL
+
+        Raises:
+            ValueError: If the backend is unknown or its configuration is missing
         """
         self.model = model
+        self.dimensions = dimensions
+        self.backend = backend
+        self._probed_dimension = None
+
+        if backend == "tei":
+            try:
+                from langchain_huggingface import HuggingFaceEndpointEmbeddings
+            except ImportError as e:
+                raise ValueError(
+                    f"The tei embedding backend needs langchain-huggingface: {str(e)}"
+                )
+
+            # TEI batches concurrent requests on the server, so no client-side tuning is needed
+            self.embeddings = HuggingFaceEndpointEmbeddings(model=settings.TEI_URL)
+            return
+
+        if backend != "openai":
+            raise ValueError(f"Unknown embedding backend: {backend}")
 
         # Validate OpenAI API key
         api_key = settings.OPENAI_API_KEY
@@ -24,7 +59,17 @@ class EmbeddingGenerationTool:
                 "Please set your OpenAI API key in the .env file or environment variables."
             )
 
-        self.embeddings = OpenAIEmbeddings(model=self.model, openai_api_key=api_key)
+        self.embeddings = self._create_openai_embeddings()
+
+    def _create_openai_embeddings(self, http_async_client=None) -> OpenAIEmbeddings:
+        """Create the OpenAI embeddings client, optionally bound to an async HTTP client."""
+        return OpenAIEmbeddings(
+            model=self.model,
+            dimensions=self.dimensions,
+            openai_api_key=settings.OPENAI_API_KEY,
+            http_client=get_http_client(),
+            http_async_client=http_async_client,
+        )
 
     def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
@@ -49,6 +94,96 @@ class EmbeddingGenerationTool:
         except Exception as e:
             raise ValueError(f"Failed to generate embeddings: {str(e)}")
 
+    def generate_embeddings_in_batches(
+        self, texts: List[str], batch_size: int = 96, max_concurrency: int = 8
+    ) -> List[List[float]]:
+        """
+        Generate embeddings for a list of texts with concurrent batched requests.
+
+        Args:
+            texts: List of text strings to embed
+            batch_size: Number of texts sent in each embedding request
+            max_concurrency: Maximum number of requests in flight at once
+
+        Returns:
+            List of embedding vectors, in the order of `texts`
+
+        Raises:
+            ValueError: If embedding generation fails
+        """
+        try:
+            if not texts:
+                return []
+
+            return asyncio.run(
+                self._embed_on_new_loop(texts, batch_size, max_concurrency)
+            )
+
+        except Exception as e:
+            raise ValueError(f"Failed to generate embeddings: {str(e)}")
+
+    async def _embed_on_new_loop(
+        self, texts: List[str], batch_size: int, max_concurrency: int
+    ) -> List[List[float]]:
+        """Run agenerate_embeddings_in_batches under a fresh asyncio.run loop."""
+        async with self.loop_embeddings() as embeddings:
+            return await self.agenerate_embeddings_in_batches(
+                texts, batch_size, max_concurrency, embeddings=embeddings
+            )
+
+    @asynccontextmanager
+    async def loop_embeddings(self) -> AsyncIterator[Embeddings]:
+        """
+        Yield an embeddings client whose async calls belong to the running event loop.
+
+        self.embeddings' async connections would be bound to the first loop that
+        used them (and shared by every ingest thread), so each asyncio.run gets
+        its own OpenAI client, closed when the block exits.
+
+        Yields:
+            Embeddings client for the running loop
+        """
+        if self.backend != "openai":
+            yield self.embeddings
+            return
+
+        async with create_async_http_client() as http_async_client:
+            yield self._create_openai_embeddings(http_async_client)
+
+    async def agenerate_embeddings_in_batches(
+        self,
+        texts: List[str],
+        batch_size: int = 96,
+        max_concurrency: int = 8,
+        embeddings: Optional[Embeddings] = None,
+    ) -> List[List[float]]:
+        """
+        Async version of generate_embeddings_in_batches, for callers already on an event loop.
+
+        Args:
+            texts: List of text strings to embed
+            batch_size: Number of texts sent in each embedding request
+            max_concurrency: Maximum number of requests in flight at once
+            embeddings: Embeddings client to use (default: self.embeddings)
+
+        Returns:
+            List of embedding vectors, in the order of `texts`
+        """
+        embeddings = embeddings or self.embeddings
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await embeddings.aembed_documents(batch)
+
+        batches = await asyncio.gather(
+            *(
+                embed_batch(texts[start : start + batch_size])
+                for start in range(0, len(texts), batch_size)
+            )
+        )
+        return [embedding for batch in batches for embedding in batch]
+
     def generate_query_embedding(self, query: str) -> List[float]:
         """
         Generate embedding for a single query text.
@@ -76,6 +211,15 @@ class EmbeddingGenerationTool:
         Returns:
             Embedding dimension
         """
+        if self.dimensions:
+            return self.dimensions
+
+        if self.backend == "tei":
+            # The served model is only known to the server; ask it once
+            if self._probed_dimension is None:
+                self._probed_dimension = len(self.embeddings.embed_query("dimension probe"))
+            return self._probed_dimension
+
         model_dimensions = {
             "text-embedding-3-small": 1536,
             "text-embedding-3-large": 3072,
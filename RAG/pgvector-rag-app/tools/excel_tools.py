@@ -1,3 +1,4 @@
+import logging
 from langchain_community.document_loaders import UnstructuredExcelLoader
 from typing import Dict, Any, List
 from pathlib import Path
@@ -5,6 +6,9 @@ from datetime import datetime
 from langchain_core.documents import Document
 
 
+logger = logging.getLogger(__name__)
+
+
 class ExcelExtractionTool:
     """
     Tool for memory-efficient Excel data extraction.
@@ -29,7 +33,7 @@ class ExcelExtractionTool:
             Dictionary containing extracted data and metadata
         """
 
-        print(f"[EXCEL_EXTRACTION] Starting extraction: {file_path}")
+        logger.info("Starting extraction: %s", file_path)
 
         try:
             # Validate file
@@ -38,7 +42,7 @@ class ExcelExtractionTool:
 
             # Get file info
             excel_info = self._get_excel_info(file_path)
-            print(f"[EXCEL_EXTRACTION] File size: {excel_info['size_mb']:.2f}MB")
+            logger.info("File size: %.2fMB", excel_info["size_mb"])
 
             loader = UnstructuredExcelLoader(
                 file_path,
@@ -47,26 +51,23 @@ class ExcelExtractionTool:
 
             # Load documents
             documents = loader.load()
-            print(
-                f"[EXCEL_EXTRACTION] Extracted {len(documents)} documents from {file_path}"
-            )
+            logger.info("Extracted %s documents from %s", len(documents), file_path)
             source_filename = original_filename or excel_info["filename"]
-            print(f"[EXCEL_EXTRACTION] Source filename: {source_filename}")
-
+            logger.info("Source filename: %s", source_filename)
+
+            common_metadata = {
+                "file_type": "excel",
+                "file_path": file_path,
+                "source_file": source_filename,  # Use original filename
+                "extraction_method": "UnstructuredExcelLoader",
+            }
             for doc in documents:
-                doc.metadata.update(
-                    {
-                        "file_type": "excel",
-                        "file_path": file_path,
-                        "source_file": source_filename,  # Use original filename
-                        "extraction_method": "UnstructuredExcelLoader",
-                    }
-                )
+                doc.metadata = {**doc.metadata, **common_metadata}
 
             return documents
 
         except Exception as e:
-            print(f"[EXCEL_EXTRACTION] Extraction failed: {str(e)}")
+            logger.error("Extraction failed: %s", e)
             raise RuntimeError(f"Excel extraction failed: {str(e)}")
 
     def _validate_excel_file(self, file_path: str) -> bool:
@@ -1,12 +1,36 @@
-from typing import List
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
 from pathlib import Path
 import tempfile
 from langchain_core.documents import Document
 
 
+logger = logging.getLogger(__name__)
+
+
+# Extraction tool of a batch_extract worker process, created once per worker
+_worker_tool = None
+
+
+def _init_worker() -> None:
+    global _worker_tool
+    _worker_tool = PDFExtractionTool()
+
+
+def _extract_in_worker(file_path: str, original_filename: Optional[str]) -> List[Document]:
+    return _worker_tool.extract_text(file_path, original_filename)
+
+
 class PDFExtractionTool:
     """Tool for extracting text and metadata from PDF documents using Unstructured."""
 
+    # PDFs whose first pages average at least this many text-layer characters skip OCR
+    TEXT_LAYER_MIN_CHARS_PER_PAGE = 200
+    TEXT_LAYER_SAMPLE_PAGES = 3
+
     def __init__(self):
         """Initialize PDF extraction tool."""
         self._check_dependencies()
@@ -16,16 +40,87 @@ class PDFExtractionTool:
         try:
             from unstructured.partition.pdf import partition_pdf
 
-            print("[PDF_EXTRACTION_TOOL] Unstructured library available")
+            logger.info("Unstructured library available")
         except ImportError as e:
             raise ImportError(f"Unstructured library not available: {str(e)}")
 
+    def _has_text_layer(self, file_path: str) -> bool:
+        """
+        Check whether a PDF is born-digital by sampling the text layer of its first pages.
+
+        Args:
+            file_path: Path to PDF file
+
+        Returns:
+            True if the sampled pages carry enough extractable text to skip OCR
+        """
+        try:
+            from pypdf import PdfReader
+
+            reader = PdfReader(file_path)
+            sample_size = min(self.TEXT_LAYER_SAMPLE_PAGES, len(reader.pages))
+            if sample_size == 0:
+                return False
+
+            chars = sum(
+                len(reader.pages[i].extract_text() or "") for i in range(sample_size)
+            )
+            return chars / sample_size >= self.TEXT_LAYER_MIN_CHARS_PER_PAGE
+
+        except Exception as e:
+            logger.warning("Text layer check failed, using OCR: %s", e)
+            return False
+
+    def _extract_with_pymupdf(
+        self, file_path: str, source_filename: str
+    ) -> Optional[List[Document]]:
+        """
+        Extract a born-digital PDF's text layer with PyMuPDF's C extractor.
+
+        Args:
+            file_path: Path to PDF file
+            source_filename: Original filename for metadata
+
+        Returns:
+            List of Document objects, one per page with text, or None if PyMuPDF is not installed
+        """
+        try:
+            import pymupdf
+        except ImportError:
+            return None
+
+        with pymupdf.open(file_path) as pdf:
+            pages = [
+                (page.number + 1, text)
+                for page in pdf
+                if (text := page.get_text("text").strip())
+            ]
+
+        return [
+            Document(
+                page_content=text,
+                metadata={
+                    "file_type": "pdf",
+                    "file_path": file_path,
+                    "source_file": source_filename,
+                    "page_number": page_num,
+                    "extraction_method": "PyMuPDF",
+                    "total_pages": len(pages),
+                },
+            )
+            for page_num, text in pages
+        ]
+
     def extract_text(
         self, file_path: str, original_filename: str = None
     ) -> List[Document]:
         """
         Extract text from PDF using Unstructured with OCR capabilities.
 
+        PDFs with a usable text layer are read directly from it, with PyMuPDF
+        when installed; only scanned PDFs go through the slower hi-res layout
+        and OCR path.
+
         Args:
             file_path: Path to PDF file
             original_filename: Original filename for metadata
@@ -38,17 +133,31 @@ class PDFExtractionTool:
         """
         source_filename = original_filename or Path(file_path).name
 
-        print(f"[PDF_EXTRACTION_TOOL] Using Unstructured for {source_filename}")
+        logger.info("Using Unstructured for %s", source_filename)
 
         try:
             from unstructured.partition.pdf import partition_pdf
 
+            if self._has_text_layer(file_path):
+                documents = self._extract_with_pymupdf(file_path, source_filename)
+                if documents is not None:
+                    logger.info(
+                        "Extracted %s pages from %s with PyMuPDF",
+                        len(documents),
+                        source_filename,
+                    )
+                    return documents
+                strategy, extraction_method = "fast", "Unstructured_Fast_Text_Layer"
+            else:
+                strategy, extraction_method = "hi_res", "Unstructured_Hi_Res_OCR"
+            logger.info("Using '%s' strategy for %s", strategy, source_filename)
+
             # Create a temporary directory for any file operations
             with tempfile.TemporaryDirectory() as temp_dir:
                 # Use Unstructured to partition the PDF with OCR
                 elements = partition_pdf(
                     filename=file_path,
-                    strategy="hi_res",  # High resolution strategy for better OCR
+                    strategy=strategy,  # High resolution strategy for better OCR when needed
                     infer_table_structure=True,  # Extract table structure
                     extract_images_in_pdf=False,  # Don't extract images to avoid permission issues
                     extract_image_block_types=[],  # Don't extract image blocks
@@ -57,8 +166,10 @@ class PDFExtractionTool:
                     output_dir_path=temp_dir,  # Use temporary directory
                 )
 
-                # Group elements by page
+                # Group elements by page, tallying per-page element counts and tables in the same pass
                 pages_content = {}
+                page_element_counts = {}
+                page_has_tables = {}
                 for element in elements:
                     # Get page number (Unstructured uses 1-based indexing)
                     page_num = getattr(element.metadata, "page_number", 1)
@@ -69,6 +180,12 @@ class PDFExtractionTool:
 
                     if page_num not in pages_content:
                         pages_content[page_num] = []
+                        page_element_counts[page_num] = 0
+                        page_has_tables[page_num] = False
+
+                    page_element_counts[page_num] += 1
+                    if "table" in type(element).__name__.lower():
+                        page_has_tables[page_num] = True
 
                     # Add element text to page content
                     if (
@@ -90,34 +207,58 @@ class PDFExtractionTool:
                             "file_path": file_path,
                             "source_file": source_filename,
                             "page_number": page_num,
-                            "extraction_method": "Unstructured_Hi_Res_OCR",
+                            "extraction_method": extraction_method,
                             "total_pages": len(pages_content),
-                            "has_tables": any(
-                                "table" in str(type(elem)).lower()
-                                for elem in elements
-                                if getattr(elem.metadata, "page_number", 1) == page_num
-                            ),
-                            "element_count": len(
-                                [
-                                    elem
-                                    for elem in elements
-                                    if getattr(elem.metadata, "page_number", 1)
-                                    == page_num
-                                ]
-                            ),
+                            "has_tables": page_has_tables[page_num],
+                            "element_count": page_element_counts[page_num],
                         },
                     )
                     documents.append(doc)
 
-                print(
-                    f"[PDF_EXTRACTION_TOOL] Successfully extracted {len(documents)} pages from {source_filename}"
+                logger.info(
+                    "Successfully extracted %s pages from %s",
+                    len(documents),
+                    source_filename,
                 )
                 return documents
 
         except ImportError as e:
             raise ValueError(f"Unstructured library not available: {str(e)}")
         except Exception as e:
-            print(
-                f"[PDF_EXTRACTION_TOOL] Extraction failed for {source_filename}: {str(e)}"
-            )
+            logger.error("Extraction failed for %s: %s", source_filename, e)
             raise ValueError(f"PDF extraction failed: {str(e)}")
+
+    def batch_extract(
+        self, items: List[Tuple[str, Optional[str]]]
+    ) -> List[List[Document]]:
+        """
+        Extract several PDFs in parallel, one worker process per CPU.
+
+        For callers ingesting many PDFs at once; the upload tab ingests one file
+        at a time and does not use it.
+
+        Args:
+            items: (file_path, original_filename) pairs
+
+        Returns:
+            The documents of each PDF, in the order of `items`
+
+        Raises:
+            ValueError: If extraction of any PDF fails
+        """
+        if not items:
+            return []
+        if len(items) == 1:
+            return [self.extract_text(*items[0])]
+
+        file_paths, original_filenames = zip(*items)
+        logger.info("Extracting %s PDFs in parallel", len(items))
+        # Layout detection and OCR are CPU-bound; spawn since the app process runs background threads
+        with ProcessPoolExecutor(
+            max_workers=min(len(items), os.cpu_count() or 1),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        ) as executor:
+            return list(
+                executor.map(_extract_in_worker, file_paths, original_filenames)
+            )
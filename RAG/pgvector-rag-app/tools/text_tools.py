@@ -1,9 +1,19 @@
+import logging
+import codecs
 from typing import List, Optional
 from pathlib import Path
 from langchain_community.document_loaders import TextLoader, UnstructuredMarkdownLoader
 from langchain_core.documents import Document
 
 
+logger = logging.getLogger(__name__)
+
+
+# Encoding detection looks at no more than this much of a file, in blocks
+ENCODING_SAMPLE_BYTES = 64 * 1024
+ENCODING_BLOCK_BYTES = 8 * 1024
+
+
 class TextExtractionTool:
     """Tool for extracting and processing plain text documents."""
 
@@ -31,40 +41,42 @@ class TextExtractionTool:
         if not Path(file_path).exists():
             raise FileNotFoundError(f"Text file not found: {file_path}")
 
-        # Detect encoding if not provided
-        if encoding is None:
+        # Detect encoding if not provided. Detection only samples a prefix of
+        # the file, so let TextLoader re-detect over the whole file if the
+        # guess fails to decode past that prefix.
+        autodetect = encoding is None
+        if autodetect:
             encoding = self.detect_encoding(file_path)
 
         try:
-            loader = TextLoader(file_path, encoding=encoding)
+            loader = TextLoader(
+                file_path, encoding=encoding, autodetect_encoding=autodetect
+            )
             documents = loader.load()
 
-            print(
-                f"[TEXT_EXTRACTION] Extracted {len(documents)} documents from {file_path}"
-            )
+            logger.info("Extracted %s documents from %s", len(documents), file_path)
 
             # Use original filename if provided, otherwise use file path
             source_filename = (
                 original_filename if original_filename else Path(file_path).name
             )
-            print(f"[TEXT_EXTRACTION] Source filename: {source_filename}")
+            logger.info("Source filename: %s", source_filename)
 
             # Enhance metadata for each document
+            common_metadata = {
+                "file_type": "text",
+                "file_path": file_path,
+                "source_file": source_filename,  # Use original filename
+                "encoding": encoding,
+                "extraction_method": "TextLoader",
+            }
             for doc in documents:
-                doc.metadata.update(
-                    {
-                        "file_type": "text",
-                        "file_path": file_path,
-                        "source_file": source_filename,  # Use original filename
-                        "encoding": encoding,
-                        "extraction_method": "TextLoader",
-                    }
-                )
+                doc.metadata = {**doc.metadata, **common_metadata}
 
             return documents
 
         except Exception as e:
-            print(f"[TEXT_EXTRACTION] Extraction failed: {str(e)}")
+            logger.error("Extraction failed: %s", e)
             raise ValueError(f"Failed to extract text from file: {str(e)}")
 
     def extract_markdown(
@@ -80,36 +92,36 @@ class TextExtractionTool:
             loader = UnstructuredMarkdownLoader(file_path)
             documents = loader.load()
 
-            print(
-                f"[MARKDOWN_EXTRACTION] Extracted {len(documents)} documents from {file_path}"
-            )
+            logger.info("Extracted %s documents from %s", len(documents), file_path)
 
             # Use original filename if provided, otherwise use file path
             source_filename = (
                 original_filename if original_filename else Path(file_path).name
             )
-            print(f"[MARKDOWN_EXTRACTION] Source filename: {source_filename}")
+            logger.info("Source filename: %s", source_filename)
 
             # Enhance metadata for each document
+            common_metadata = {
+                "file_type": "markdown",
+                "file_path": file_path,
+                "source_file": source_filename,  # Use original filename
+                "extraction_method": "UnstructuredMarkdownLoader",
+            }
             for doc in documents:
-                doc.metadata.update(
-                    {
-                        "file_type": "markdown",
-                        "file_path": file_path,
-                        "source_file": source_filename,  # Use original filename
-                        "extraction_method": "UnstructuredMarkdownLoader",
-                    }
-                )
+                doc.metadata = {**doc.metadata, **common_metadata}
 
             return documents
 
         except Exception as e:
-            print(f"[MARKDOWN_EXTRACTION] Extraction failed: {str(e)}")
+            logger.error("Markdown extraction failed: %s", e)
             raise ValueError(f"Failed to extract text from file: {str(e)}")
 
     def detect_encoding(self, file_path: str) -> str:
         """
-        Detect text file encoding.
+        Detect text file encoding from a bounded prefix of the file.
+
+        A UTF-8 BOM or a prefix that decodes as UTF-8 is answered without
+        running chardet; only other prefixes go through detection.
 
         Args:
             file_path: Path to text file
@@ -117,28 +129,40 @@ class TextExtractionTool:
         Returns:
             Detected encoding string
         """
+        try:
+            with open(file_path, "rb") as f:
+                raw_data = f.read(ENCODING_SAMPLE_BYTES)
+        except OSError:
+            return "utf-8"
+
+        if raw_data.startswith(codecs.BOM_UTF8):
+            return "utf-8-sig"
+        try:
+            # Incremental decoding tolerates a multi-byte character cut off at the end
+            codecs.getincrementaldecoder("utf-8")().decode(raw_data, final=False)
+            return "utf-8"
+        except UnicodeDecodeError:
+            pass
+
         try:
             # Try to import chardet for encoding detection
-            import chardet
+            from chardet.universaldetector import UniversalDetector
 
-            with open(file_path, "rb") as f:
-                raw_data = f.read()
-                result = chardet.detect(raw_data)
-                return result["encoding"] or "utf-8"
+            # Feed blocks of the prefix until chardet is confident
+            detector = UniversalDetector()
+            for start in range(0, len(raw_data), ENCODING_BLOCK_BYTES):
+                detector.feed(raw_data[start : start + ENCODING_BLOCK_BYTES])
+                if detector.done:
+                    break
+            detector.close()
+            return detector.result["encoding"] or "latin-1"
 
         except ImportError:
-            # Fallback: try common encodings
-            encodings = ["utf-8", "ascii", "latin-1", "cp1252"]
-
-            for encoding in encodings:
-                try:
-                    with open(file_path, "r", encoding=encoding) as f:
-                        f.read()
-                    return encoding
-                except UnicodeDecodeError:
-                    continue
-
-            # Default fallback
-            return "utf-8"
+            # Fallback: cp1252 if the prefix is valid in it, else latin-1, which decodes any bytes
+            try:
+                raw_data.decode("cp1252")
+                return "cp1252"
+            except UnicodeDecodeError:
+                return "latin-1"
         except Exception:
             return "utf-8"
@@ -1,10 +1,94 @@
-from typing import Any, List, Optional, Dict
-from uuid import UUID
+import asyncio
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID, uuid4
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document
-from engine_service import get_shared_pg_engine
+from langchain_core.retrievers import BaseRetriever
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from engine_service import (
+    arun_with_connection,
+    get_shared_pg_engine,
+    run_with_connection,
+)
+from answer_cache import invalidate_answer_cache
 from tools.embedding_tools import EmbeddingGenerationTool
 from config import settings
 from langchain_postgres import PGVectorStore
+from langchain_postgres.v2.indexes import HNSWIndex, HNSWQueryOptions
+
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1024)
+def _collection_name(resource_id: UUID, suffix: str) -> str:
+    """Table name for a resource; cached since it is looked up on every request."""
+    # Convert UUID to string and replace hyphens with underscores
+    return f"resource_{str(resource_id).replace('-', '_')}{suffix}"
+
+
+@dataclass
+class HalfvecHNSWIndex(HNSWIndex):
+    """HNSW index over a halfvec column, which needs the halfvec operator classes."""
+
+    def get_index_function(self) -> str:
+        # e.g. vector_cosine_ops -> halfvec_cosine_ops
+        return self.distance_strategy.index_function.replace("vector_", "halfvec_", 1)
+
+
+# Batches at least this large are written with COPY rather than per-row INSERTs
+COPY_MIN_ROWS = 32
+
+# Upper bound pgvector accepts for hnsw.ef_search
+MAX_EF_SEARCH = 1000
+
+
+def default_ef_search(k: int) -> int:
+    """
+    HNSW candidate list size for a top-k search.
+
+    An HNSW scan returns at most ef_search rows, so pgvector's fixed default
+    of 40 silently truncates larger k; 4x k keeps recall up as k grows.
+
+    Args:
+        k: Number of rows the search fetches
+
+    Returns:
+        Value for hnsw.ef_search
+    """
+    return min(max(4 * k, 40), MAX_EF_SEARCH)
+
+# Largest embedding kept inline (STORAGE PLAIN); a row must fit in an 8KB page,
+# e.g. 1536 dims as vector (6KB) or up to ~3500 dims as halfvec
+PLAIN_STORAGE_MAX_BYTES = 7000
+
+
+class TwoStageRetriever(BaseRetriever):
+    """Retriever backed by VectorService.similarity_search_2stage."""
+
+    vector_service: Any
+    resource_id: UUID
+    k: int = 5
+    oversample: int = 20
+    ef_search: Optional[int] = None
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.vector_service.similarity_search_2stage(
+            query,
+            self.resource_id,
+            k=self.k,
+            oversample=self.oversample,
+            ef_search=self.ef_search,
+        )
 
 
 class VectorService:
@@ -26,13 +110,39 @@ class VectorService:
             raise ValueError("DATABASE_URL is required for vector operations")
 
         # Initialize tools for stateless operations
-        self.embedding_tool = EmbeddingGenerationTool(model="text-embedding-3-small")
+        if settings.EMBEDDING_BACKEND == "tei":
+            self.embedding_tool = EmbeddingGenerationTool(
+                model=settings.TEI_MODEL, backend="tei"
+            )
+        else:
+            self.embedding_tool = EmbeddingGenerationTool(
+                model="text-embedding-3-small", dimensions=settings.EMBEDDING_DIMENSIONS
+            )
 
         self.embeddings = self.embedding_tool.embeddings
 
+        # Column type of newly created tables: "vector" or "halfvec"
+        self.vector_type = settings.VECTOR_TYPE
+
         # Always use shared engine to eliminate connection proliferation
         self.engine = get_shared_pg_engine()
-        print("[VECTOR_SERVICE] Using shared PGEngine for vector operations")
+        logger.debug("Using shared PGEngine for vector operations")
+
+        # Vector stores by collection name and ef_search, and the tables known to
+        # exist, so the table check runs once per collection. The service is shared
+        # by the script thread and the ingest pool, hence the lock.
+        self._vector_stores: Dict[Tuple[str, Optional[int]], PGVectorStore] = {}
+        self._initialized_tables = set()
+        self._vector_stores_lock = threading.Lock()
+        # Table name suffix for the embedding setup, worked out on first use
+        self._collection_suffix: Optional[str] = None
+        # Collections known to have their HNSW index
+        self._indexed_collections = set()
+        # Collections known to have the binary-quantized index for two-stage search,
+        # and those whose index is being built in the background
+        self._binary_indexed_collections = set()
+        self._binary_index_builds = set()
+        self._binary_index_lock = threading.Lock()
 
     def get_collection_name(self, resource_id: UUID) -> str:
         """
@@ -44,14 +154,29 @@ class VectorService:
         Returns:
             Collection name
         """
-        # Convert UUID to string and replace hyphens with underscores
-        resource_id_str = str(resource_id)
-        resource_part = f"resource_{resource_id_str.replace('-', '_')}"
-
-        # One table per resource (current/recommended)
-        return f"{resource_part}_documents"
-
-    def _create_vector_store(self, collection_name: str) -> "PGVectorStore":
+        # One table per resource (current/recommended); shortened embeddings get
+        # their own table, since a table's vector column has a fixed size
+        if self._collection_suffix is None:
+            if self.embedding_tool.backend == "tei":
+                # Vectors from a local model live apart from OpenAI ones; the name
+                # limit leaves no room for the model, so only its size tells them apart
+                suffix = f"_tei{self.embedding_tool.get_embedding_dimension()}"
+            elif self.embedding_tool.dimensions:
+                suffix = f"_d{self.embedding_tool.dimensions}"
+            else:
+                suffix = ""
+            # halfvec tables get their own name too, so a table never mixes column types
+            # ("_halfvec" is shorter than "_documents", keeping within the name limit)
+            if self.vector_type == "halfvec":
+                self._collection_suffix = f"{suffix}_halfvec"
+            else:
+                self._collection_suffix = f"{suffix}_documents"
+
+        return _collection_name(resource_id, self._collection_suffix)
+
+    def _create_vector_store(
+        self, collection_name: str, ef_search: Optional[int] = None
+    ) -> "PGVectorStore":
         """
         Create a vector store instance using shared engine.
 
@@ -59,6 +184,8 @@ class VectorService:
 
         Args:
             collection_name: Name of the collection/table
+            ef_search: hnsw.ef_search set (SET LOCAL) for each of the store's
+                searches; None keeps the server setting
 
         Returns:
             PGVectorStore instance
@@ -66,9 +193,7 @@ class VectorService:
         Raises:
             RuntimeError: If vector store creation fails
         """
-        print(
-            f"[VECTOR_SERVICE] Creating vector store for collection: {collection_name}"
-        )
+        logger.debug("Creating vector store for collection: %s", collection_name)
 
         try:
             # Use shared engine instead of creating new one
@@ -76,27 +201,33 @@ class VectorService:
                 engine=self.engine,  # REUSE SHARED ENGINE
                 table_name=collection_name,
                 embedding_service=self.embeddings,
+                index_query_options=(
+                    HNSWQueryOptions(ef_search=ef_search) if ef_search else None
+                ),
             )
 
-            print(
-                f"[VECTOR_SERVICE] Successfully created vector store for {collection_name}"
-            )
+            logger.debug("Successfully created vector store for %s", collection_name)
             return vector_store
 
         except Exception as e:
-            print(
-                f"[VECTOR_SERVICE] Failed to create vector store for {collection_name}: {str(e)}"
+            logger.exception(
+                "Failed to create vector store for %s: %s", collection_name, e
             )
             raise RuntimeError(f"Failed to create vector store: {str(e)}")
 
-    def _get_vector_store(self, collection_name: str) -> "PGVectorStore":
+    def _get_vector_store(
+        self, collection_name: str, ef_search: Optional[int] = None
+    ) -> "PGVectorStore":
         """
         Get or create a vector store instance for the given collection.
 
-        Uses shared engine instead of creating new ones.
+        Uses shared engine instead of creating new ones, and reuses the
+        instance created for the collection and ef_search on earlier calls.
 
         Args:
             collection_name: Name of the collection/table
+            ef_search: hnsw.ef_search for the store's searches (None keeps the
+                server setting)
 
         Returns:
             PGVectorStore instance
@@ -104,34 +235,81 @@ class VectorService:
         Raises:
             RuntimeError: If vector store creation fails
         """
-        print(
-            f"[VECTOR_SERVICE] Getting vector store for collection: {collection_name}"
-        )
+        logger.debug("Getting vector store for collection: %s", collection_name)
+
+        key = (collection_name, ef_search)
+        vector_store = self._vector_stores.get(key)
+        if vector_store is not None:
+            return vector_store
 
         try:
-            # Ensure table exists first
-            print(f"[VECTOR_SERVICE] Ensuring {collection_name} table exists ")
-            self._ensure_table_exists(collection_name)
+            # Ensure table exists first; its HNSW index is built after the first ingest
+            self._ensure_table_ready(collection_name)
 
-            # Use shared engine instead of creating new one
-            vector_store = PGVectorStore.create_sync(
-                engine=self.engine,  # REUSE SHARED ENGINE
-                table_name=collection_name,
-                embedding_service=self.embeddings,
-            )
+            with self._vector_stores_lock:
+                # Another thread may have created it while this one waited
+                if key in self._vector_stores:
+                    return self._vector_stores[key]
 
-            print(
-                f"[VECTOR_SERVICE] Successfully got vector store for {collection_name}"
-            )
-            return vector_store
+                vector_store = self._create_vector_store(collection_name, ef_search)
+
+                logger.debug("Successfully got vector store for %s", collection_name)
+                self._vector_stores[key] = vector_store
+                return vector_store
 
         except Exception as e:
-            print(
-                f"[VECTOR_SERVICE] Failed to get vector store for {collection_name}: {str(e)}"
+            logger.exception(
+                "Failed to get vector store for %s: %s", collection_name, e
             )
             raise RuntimeError(f"Failed to get vector store: {str(e)}")
 
-    def _ensure_table_exists(self, collection_name: str) -> None:
+    def _ensure_table_ready(self, collection_name: str) -> None:
+        """
+        Ensure the collection's table exists, checking the database once per collection.
+
+        Args:
+            collection_name: Name of the collection/table
+        """
+        if collection_name in self._initialized_tables:
+            return
+
+        with self._vector_stores_lock:
+            # Another thread may have checked it while this one waited
+            if collection_name in self._initialized_tables:
+                return
+            logger.debug("Ensuring %s table exists ", collection_name)
+            self._ensure_table_exists(collection_name)
+            self._initialized_tables.add(collection_name)
+
+    def _ensure_vector_index(
+        self, collection_name: str, vector_store: PGVectorStore
+    ) -> None:
+        """
+        Build the collection's HNSW index if it does not exist yet.
+
+        Called after documents are stored rather than when the table is created,
+        so the first ingest loads rows without per-row index maintenance and
+        the index is then built in one pass over them.
+
+        Args:
+            collection_name: Name of the collection/table
+            vector_store: Vector store for the collection
+        """
+        if collection_name in self._indexed_collections:
+            return
+
+        with self._vector_stores_lock:
+            if collection_name in self._indexed_collections:
+                return
+            if not vector_store.is_valid_index():
+                if self.vector_type == "halfvec":
+                    vector_store.apply_vector_index(HalfvecHNSWIndex())
+                else:
+                    vector_store.apply_vector_index(HNSWIndex())
+                logger.info("Created HNSW index for %s", collection_name)
+            self._indexed_collections.add(collection_name)
+
+    def _ensure_table_exists(self, collection_name: str) -> bool:
         """
         Ensure that the vector table exists for the collection.
 
@@ -140,16 +318,19 @@ class VectorService:
         Args:
             collection_name: Name of the collection/table
 
+        Returns:
+            True if the table was created by this call
+
         Raises:
             RuntimeError: If table creation fails for reasons other than existing table
         """
 
-        print(f"[VECTOR_SERVICE] Ensuring table exists: {collection_name}")
+        logger.debug("Ensuring table exists: %s", collection_name)
 
         try:
             # Use shared engine for table initialization
             vector_size = self.embedding_tool.get_embedding_dimension()
-            print(f"[VECTOR_SERVICE] Vector size: {vector_size}")
+            logger.debug("Vector size: %s", vector_size)
 
             # Try to initialize table, but handle DuplicateTable gracefully
             try:
@@ -157,36 +338,107 @@ class VectorService:
                     table_name=collection_name,
                     vector_size=vector_size,
                 )
-                print(
-                    f"[VECTOR_SERVICE] Successfully created new table: {collection_name}"
-                )
+                logger.info("Successfully created new table: %s", collection_name)
+                created = True
             except Exception as table_error:
                 # Check if it's a DuplicateTable error (table already exists)
                 if "already exists" in str(table_error) or "DuplicateTable" in str(
                     table_error
                 ):
-                    print(
-                        f"[VECTOR_SERVICE] Table already exists (expected): {collection_name}"
-                    )
+                    logger.debug("Table already exists (expected): %s", collection_name)
+                    created = False
                 else:
                     # Re-raise if it's a different error
                     raise table_error
 
-            print(f"[VECTOR_SERVICE] Table ready for use: {collection_name}")
+            # Also on the existing-table path: an earlier run may have created the
+            # table and then failed before configuring its embedding column
+            run_with_connection(
+                self.engine,
+                self._configure_embedding_column,
+                collection_name,
+                vector_size,
+            )
+
+            logger.debug("Table ready for use: %s", collection_name)
+            return created
 
         except Exception as e:
-            print(f"[VECTOR_SERVICE] Failed to ensure table exists: {str(e)}")
+            logger.exception("Failed to ensure table exists: %s", e)
             raise RuntimeError(f"Failed to ensure table exists: {str(e)}")
 
+    async def _configure_embedding_column(
+        self, conn: AsyncConnection, collection_name: str, vector_size: int
+    ) -> None:
+        """
+        Bring the table's embedding column to the configured type and storage.
+
+        init_vectorstore_table always creates a vector column. For halfvec, the
+        column is switched over: inserts and the <=>, <#> and <-> operators work
+        the same on halfvec, which stores each dimension in 2 bytes instead of 4.
+        The current type and storage are read from pg_attribute first, so only
+        missing changes are applied and a table left half-configured is repaired.
+
+        Embeddings are also stored PLAIN (inline, uncompressed) when they fit in
+        a page. By default a 6KB vector is compressed and moved out of line, so
+        every distance computation in a scan first detoasts and decompresses it.
+        Run it through run_with_connection.
+
+        Args:
+            conn: Connection from the engine's pool
+            collection_name: Name of the collection/table
+            vector_size: Number of dimensions of the embedding column
+        """
+        result = await conn.execute(
+            text(
+                "SELECT format_type(atttypid, atttypmod) AS column_type, "
+                "attstorage FROM pg_attribute "
+                "WHERE attrelid = CAST(:table_name AS regclass) "
+                "AND attname = 'embedding'"
+            ),
+            {"table_name": f'"public"."{collection_name}"'},
+        )
+        column = result.mappings().one()
+
+        clauses = []
+        if self.vector_type == "halfvec":
+            column_type = f"halfvec({int(vector_size)})"
+            embedding_bytes = 2 * vector_size
+        else:
+            column_type = f"vector({int(vector_size)})"
+            embedding_bytes = 4 * vector_size
+        if column["column_type"] != column_type:
+            clauses.append(f"ALTER COLUMN embedding TYPE {column_type}")
+        # "p" is PLAIN
+        if embedding_bytes <= PLAIN_STORAGE_MAX_BYTES and column["attstorage"] != "p":
+            clauses.append("ALTER COLUMN embedding SET STORAGE PLAIN")
+        if not clauses:
+            await conn.rollback()
+            return
+
+        # One statement, so type and storage change together or not at all
+        await conn.execute(
+            text(f'ALTER TABLE "public"."{collection_name}" {", ".join(clauses)}')
+        )
+        await conn.commit()
+        logger.info("Configured embedding column of %s: %s", collection_name, clauses)
+
     def create_retriever(
-        self, resource_id: UUID, search_kwargs: Optional[Dict[str, Any]] = None
+        self,
+        resource_id: UUID,
+        search_kwargs: Optional[Dict[str, Any]] = None,
+        search_type: str = "similarity",
     ):
         """
         Create a retriever for document search.
 
         Args:
             resource_id: UUID
-            search_kwargs: Optional search parameters
+            search_kwargs: Optional search parameters; ef_search sets the HNSW
+                candidate list size (default: default_ef_search of k, or of
+                fetch_k for "mmr"). For "two_stage" these are k, oversample and
+                ef_search (see similarity_search_2stage)
+            search_type: "similarity", "mmr" or "two_stage"
 
         Returns:
             Configured retriever for the resource
@@ -196,28 +448,43 @@ class VectorService:
         """
         try:
             collection_name = self.get_collection_name(resource_id)
-            print(
-                f"[VECTOR_SERVICE] Creating retriever for collection: {collection_name}"
-            )
+            logger.debug("Creating retriever for collection: %s", collection_name)
 
             # SERVICE RESPONSIBILITY: Prepare project-specific search parameters
             # Note: No project_id filter needed since table name provides isolation
-            default_search_kwargs = {"search_type": "similarity", "k": 5}
+            default_search_kwargs = {"k": 5}
 
             # Merge with provided search kwargs
             if search_kwargs:
                 default_search_kwargs.update(search_kwargs)
 
+            if search_type == "two_stage":
+                return TwoStageRetriever(
+                    vector_service=self,
+                    resource_id=resource_id,
+                    **default_search_kwargs,
+                )
+
+            # MMR ranks fetch_k candidates, so that is what the HNSW scan must return
+            ef_search = default_search_kwargs.pop("ef_search", None)
+            if ef_search is None:
+                if search_type == "mmr":
+                    ef_search = default_ef_search(default_search_kwargs.get("fetch_k", 20))
+                else:
+                    ef_search = default_ef_search(default_search_kwargs["k"])
+
             # SERVICE RESPONSIBILITY: Create retriever using pre-created vector store
-            print(f"[VECTOR_SERVICE] Creating retriever using existing vector store")
-            vector_store = self._get_vector_store(collection_name)
-            retriever = vector_store.as_retriever(search_kwargs=default_search_kwargs)
+            logger.debug("Creating retriever using existing vector store")
+            vector_store = self._get_vector_store(collection_name, ef_search)
+            retriever = vector_store.as_retriever(
+                search_type=search_type, search_kwargs=default_search_kwargs
+            )
 
-            print(f"[VECTOR_SERVICE] Successfully created retriever")
+            logger.debug("Successfully created retriever")
             return retriever
 
         except Exception as e:
-            print(f"[VECTOR_SERVICE] Failed to create retriever: {str(e)}")
+            logger.exception("Failed to create retriever: %s", e)
             raise RuntimeError(f"Failed to create retriever: {str(e)}")
 
     def similarity_search(
@@ -226,6 +493,7 @@ class VectorService:
         resource_id: UUID,
         k: int = 5,
         filter_dict: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None,
     ) -> List[Document]:
         """
         Perform similarity search.
@@ -235,6 +503,7 @@ class VectorService:
             resource_id: UUID
             k: Number of results to return
             filter_dict: Additional filters
+            ef_search: HNSW candidate list size (default: default_ef_search(k))
 
         Returns:
             List of similar documents
@@ -244,36 +513,421 @@ class VectorService:
         """
         try:
             collection_name = self.get_collection_name(resource_id)
-            print(
-                f"[VECTOR_SERVICE] Performing similarity search in collection: {collection_name}"
+            logger.debug(
+                "Performing similarity search in collection: %s", collection_name
             )
 
             # SERVICE RESPONSIBILITY: Prepare search filter (no project_id needed due to table isolation)
             search_filter = filter_dict if filter_dict else None
 
             # SERVICE RESPONSIBILITY: Perform search using pre-created vector store
-            print(f"[VECTOR_SERVICE] Performing search using existing vector store")
-            vector_store = self._get_vector_store(collection_name)
+            logger.debug("Performing search using existing vector store")
+            vector_store = self._get_vector_store(
+                collection_name, ef_search or default_ef_search(k)
+            )
             results = vector_store.similarity_search(query, k=k, filter=search_filter)
 
-            print(f"[VECTOR_SERVICE] Found {len(results)} similar documents")
+            logger.debug("Found %s similar documents", len(results))
+            return results
+
+        except Exception as e:
+            logger.exception("Similarity search failed: %s", e)
+            raise RuntimeError(f"Similarity search failed: {str(e)}")
+
+    def similarity_search_batch(
+        self,
+        queries: List[str],
+        resource_id: UUID,
+        k: int = 5,
+        ef_search: Optional[int] = None,
+    ) -> List[List[Document]]:
+        """
+        Perform similarity search for several queries in one database round trip.
+
+        All queries are embedded in a single request, then one JOIN LATERAL
+        statement runs a top-k search per query vector.
+
+        Args:
+            queries: Search queries
+            resource_id: UUID
+            k: Number of results to return per query
+            ef_search: HNSW candidate list size for this search
+                (default: default_ef_search(k)); raise it for better recall
+
+        Returns:
+            List of similar documents for each query, in query order
+
+        Raises:
+            RuntimeError: If search operation fails
+        """
+        if not queries:
+            return []
+
+        try:
+            collection_name = self.get_collection_name(resource_id)
+            logger.debug(
+                "Performing batch similarity search for %s queries in collection: %s",
+                len(queries),
+                collection_name,
+            )
+
+            # Make sure the table exists before querying it directly
+            self._ensure_table_ready(collection_name)
+            query_embeddings = self.embeddings.embed_documents(queries)
+
+            params: Dict[str, Any] = {"k": k}
+            values = []
+            for i, embedding in enumerate(query_embeddings):
+                params[f"idx_{i}"] = i
+                params[f"emb_{i}"] = str([float(value) for value in embedding])
+                values.append(f"(:idx_{i}, CAST(:emb_{i} AS {self.vector_type}))")
+
+            # The inner ORDER BY <=> ... LIMIT is the form the HNSW index serves
+            statement = text(
+                f"""SELECT q.idx, t.langchain_id, t.content, t.langchain_metadata
+                FROM (VALUES {", ".join(values)}) AS q(idx, emb)
+                CROSS JOIN LATERAL (
+                    SELECT langchain_id, content, langchain_metadata
+                    FROM "public"."{collection_name}"
+                    ORDER BY embedding <=> q.emb
+                    LIMIT :k
+                ) AS t
+                ORDER BY q.idx"""
+            )
+
+            if ef_search is None:
+                ef_search = default_ef_search(k)
+
+            async def run_query(conn: AsyncConnection):
+                # Scoped to this statement's transaction, like HNSWQueryOptions
+                await conn.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+                result = await conn.execute(statement, params)
+                return result.mappings().fetchall()
+
+            rows = run_with_connection(self.engine, run_query)
+
+            results: List[List[Document]] = [[] for _ in queries]
+            for row in rows:
+                results[row["idx"]].append(
+                    Document(
+                        id=str(row["langchain_id"]),
+                        page_content=row["content"],
+                        metadata=row["langchain_metadata"] or {},
+                    )
+                )
+
+            logger.debug(
+                "Found %s similar documents for %s queries", len(rows), len(queries)
+            )
+            return results
+
+        except Exception as e:
+            logger.exception("Batch similarity search failed: %s", e)
+            raise RuntimeError(f"Batch similarity search failed: {str(e)}")
+
+    def _binary_index_ready(self, collection_name: str, vector_size: int) -> bool:
+        """
+        Check whether the HNSW index over binary-quantized embeddings is usable.
+
+        The index is on an expression rather than a stored bit column, so existing
+        tables need no migration; it is only built for collections that use
+        two-stage search. The first check starts a background
+        CREATE INDEX CONCURRENTLY, which does not block writes to the table;
+        until it finishes, this returns False.
+
+        Args:
+            collection_name: Name of the collection/table
+            vector_size: Number of dimensions of the embedding column
+
+        Returns:
+            True if the index exists and is valid
+        """
+        if collection_name in self._binary_indexed_collections:
+            return True
+
+        # Identifiers are cut to 63 bytes; names here are ASCII
+        index_name = f"{collection_name}_bq"[:63]
+
+        async def index_state(conn: AsyncConnection):
+            result = await conn.execute(
+                text(
+                    "SELECT i.indisvalid FROM pg_index i "
+                    "JOIN pg_class c ON c.oid = i.indexrelid "
+                    "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                    "WHERE n.nspname = 'public' AND c.relname = :index_name"
+                ),
+                {"index_name": index_name},
+            )
+            return result.scalar()
+
+        is_valid = run_with_connection(self.engine, index_state)
+        if is_valid:
+            self._binary_indexed_collections.add(collection_name)
+            return True
+
+        with self._binary_index_lock:
+            if collection_name in self._binary_index_builds:
+                return False
+            self._binary_index_builds.add(collection_name)
+
+        async def build_index(conn: AsyncConnection):
+            # CONCURRENTLY cannot run inside a transaction block
+            autocommit_conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            if is_valid is False:
+                # Left invalid by an interrupted concurrent build; start over
+                await autocommit_conn.execute(
+                    text(f'DROP INDEX CONCURRENTLY IF EXISTS "public"."{index_name}"')
+                )
+            await autocommit_conn.execute(
+                text(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{index_name}" '
+                    f'ON "public"."{collection_name}" USING hnsw '
+                    f"((binary_quantize(embedding)::bit({vector_size})) bit_hamming_ops)"
+                )
+            )
+
+        def run_build():
+            try:
+                run_with_connection(self.engine, build_index)
+                self._binary_indexed_collections.add(collection_name)
+                logger.info("Binary-quantized index ready for %s", collection_name)
+            except Exception as e:
+                logger.exception(
+                    "Failed to build binary-quantized index for %s: %s",
+                    collection_name,
+                    e,
+                )
+            finally:
+                with self._binary_index_lock:
+                    self._binary_index_builds.discard(collection_name)
+
+        logger.info("Building binary-quantized index for %s", collection_name)
+        threading.Thread(target=run_build, daemon=True).start()
+        return False
+
+    def similarity_search_2stage(
+        self,
+        query: str,
+        resource_id: UUID,
+        k: int = 5,
+        oversample: int = 20,
+        ef_search: Optional[int] = None,
+    ) -> List[Document]:
+        """
+        Perform similarity search in two stages: a binary shortlist, then an exact rerank.
+
+        The shortlist of oversample * k rows comes from an HNSW index over
+        binary-quantized embeddings (Hamming distance on bits, far cheaper than
+        float distances); only those rows are then ranked by cosine distance on
+        the full embeddings. Worth it for large collections (~100k+ chunks).
+        While that index is still being built, this falls back to similarity_search.
+
+        Args:
+            query: Search query
+            resource_id: UUID
+            k: Number of results to return
+            oversample: Shortlist size as a multiple of k; raise it for better recall
+            ef_search: HNSW candidate list size for the shortlist; defaults to
+                the shortlist size, since the index returns at most that many rows
+
+        Returns:
+            List of similar documents
+
+        Raises:
+            RuntimeError: If search operation fails
+        """
+        try:
+            collection_name = self.get_collection_name(resource_id)
+            logger.debug(
+                "Performing two-stage similarity search in collection: %s",
+                collection_name,
+            )
+
+            # Make sure the table exists before querying it directly
+            self._ensure_table_ready(collection_name)
+            vector_size = int(self.embedding_tool.get_embedding_dimension())
+            if not self._binary_index_ready(collection_name, vector_size):
+                logger.debug(
+                    "Binary-quantized index not ready for %s, using a single-stage search",
+                    collection_name,
+                )
+                return self.similarity_search(
+                    query, resource_id, k=k, ef_search=ef_search
+                )
+
+            candidates = k * oversample
+            if ef_search is None:
+                ef_search = min(max(candidates, 40), MAX_EF_SEARCH)
+
+            embedding = self.embeddings.embed_query(query)
+            params = {
+                "embedding": str([float(value) for value in embedding]),
+                "k": k,
+                "candidates": candidates,
+            }
+            # The shortlist ORDER BY must match the index expression for the index to serve it
+            statement = text(
+                f"""WITH shortlist AS (
+                    SELECT langchain_id, content, langchain_metadata, embedding
+                    FROM "public"."{collection_name}"
+                    ORDER BY binary_quantize(embedding)::bit({vector_size})
+                        <~> binary_quantize(CAST(:embedding AS {self.vector_type}))
+                    LIMIT :candidates
+                )
+                SELECT langchain_id, content, langchain_metadata
+                FROM shortlist
+                ORDER BY embedding <=> CAST(:embedding AS {self.vector_type})
+                LIMIT :k"""
+            )
+
+            async def run_query(conn: AsyncConnection):
+                await conn.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+                result = await conn.execute(statement, params)
+                return result.mappings().fetchall()
+
+            rows = run_with_connection(self.engine, run_query)
+            results = [
+                Document(
+                    id=str(row["langchain_id"]),
+                    page_content=row["content"],
+                    metadata=row["langchain_metadata"] or {},
+                )
+                for row in rows
+            ]
+
+            logger.debug("Found %s similar documents", len(results))
             return results
 
         except Exception as e:
-            print(f"[VECTOR_SERVICE] Similarity search failed: {str(e)}")
+            logger.exception("Two-stage similarity search failed: %s", e)
             raise RuntimeError(f"Similarity search failed: {str(e)}")
 
+    async def asimilarity_search(
+        self,
+        query: str,
+        resource_id: UUID,
+        k: int = 5,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[Document]:
+        """
+        Perform similarity search without blocking the caller's event loop.
+
+        Args:
+            query: Search query
+            resource_id: UUID
+            k: Number of results to return
+            filter_dict: Additional filters
+            ef_search: HNSW candidate list size (default: default_ef_search(k))
+
+        Returns:
+            List of similar documents
+
+        Raises:
+            RuntimeError: If search operation fails
+        """
+        try:
+            collection_name = self.get_collection_name(resource_id)
+            logger.debug(
+                "Performing async similarity search in collection: %s", collection_name
+            )
+
+            vector_store = await asyncio.to_thread(
+                self._get_vector_store,
+                collection_name,
+                ef_search or default_ef_search(k),
+            )
+            results = await vector_store.asimilarity_search(
+                query, k=k, filter=filter_dict if filter_dict else None
+            )
+
+            logger.debug("Found %s similar documents", len(results))
+            return results
+
+        except Exception as e:
+            logger.exception("Async similarity search failed: %s", e)
+            raise RuntimeError(f"Similarity search failed: {str(e)}")
+
+    def _prepare_batch(self, batch: List[Document]):
+        """
+        Build the texts, metadata and ids for inserting a batch of documents.
+
+        Args:
+            batch: Documents to insert
+
+        Returns:
+            Tuple of (texts, metadatas, ids)
+        """
+        texts = [doc.page_content for doc in batch]
+        # The table already identifies the collection, so metadata is stored as is
+        metadatas = [doc.metadata for doc in batch]
+        # Ids are assigned here so the COPY path can write them directly
+        ids = [str(uuid4()) for _ in batch]
+        return texts, metadatas, ids
+
+    async def _copy_embeddings(
+        self,
+        conn: AsyncConnection,
+        collection_name: str,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str],
+    ) -> None:
+        """
+        Bulk-insert rows with COPY FROM STDIN in one transaction.
+
+        PGVectorStore.add_embeddings runs one INSERT and commit per row; COPY
+        streams the whole batch instead. Run it through run_with_connection.
+
+        Args:
+            conn: Connection from the engine's pool
+            collection_name: Name of the collection/table
+            texts: Chunk texts
+            embeddings: Embedding vector per chunk
+            metadatas: Metadata per chunk
+            ids: Id per chunk
+        """
+        raw_connection = await conn.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        async with driver_connection.cursor() as cursor:
+            async with cursor.copy(
+                f'COPY "public"."{collection_name}" '
+                "(langchain_id, content, embedding, langchain_metadata) FROM STDIN"
+            ) as copy:
+                for row_id, content, embedding, metadata in zip(
+                    ids, texts, embeddings, metadatas
+                ):
+                    # pgvector parses the "[x, y, ...]" text form
+                    await copy.write_row(
+                        (
+                            row_id,
+                            content,
+                            str([float(value) for value in embedding]),
+                            json.dumps(metadata),
+                        )
+                    )
+        await driver_connection.commit()
+
     def store_documents(
         self,
         documents: List[Document],
         resource_id: UUID,
+        embeddings: Optional[List[List[float]]] = None,
+        batch_size: int = 1000,
     ) -> Dict[str, Any]:
         """
         Store documents in vector database.
 
+        Documents are embedded and inserted `batch_size` at a time, so at most
+        one batch of embedding vectors is held in memory.
+
         Args:
             documents: List of documents to store
             resource_id: UUID
+            embeddings: Precomputed embeddings, one per document (generated in
+                concurrent batches if not provided)
+            batch_size: Number of documents embedded and inserted per round
 
         Returns:
             Storage result with metadata
@@ -281,40 +935,195 @@ class VectorService:
         Raises:
             RuntimeError: If storage operation fails
         """
-        print(
-            f"Storing documents in vector database {len(documents)}",
+        logger.debug("Storing documents in vector database %s", len(documents))
+        return self.store_documents_iter(
+            documents, resource_id, embeddings=embeddings, batch_size=batch_size
         )
 
+    def store_documents_iter(
+        self,
+        documents: Iterable[Document],
+        resource_id: UUID,
+        embeddings: Optional[Iterable[List[float]]] = None,
+        batch_size: int = 512,
+        on_batch: Optional[Callable[[int], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Store a stream of documents in vector database.
+
+        Documents are pulled from the iterable `batch_size` at a time, so neither
+        the documents nor their embeddings need to be held in memory all at once.
+
+        Args:
+            documents: Documents to store, e.g. a generator
+            resource_id: UUID
+            embeddings: Precomputed embeddings, one per document, in the same
+                order (generated in concurrent batches if not provided)
+            batch_size: Number of documents embedded and inserted per round
+            on_batch: Called with the running total of stored documents after each batch
+
+        Returns:
+            Storage result with metadata
+
+        Raises:
+            RuntimeError: If storage operation fails
+        """
         try:
             collection_name = self.get_collection_name(resource_id)
-            print(f"[VECTOR_SERVICE] Using collection name: {collection_name}")
-
-            # SERVICE RESPONSIBILITY: Add metadata
-            print(f"[VECTOR_SERVICE] Adding metadata to {len(documents)} documents")
-            for doc in documents:
-                doc.metadata.update({"collection": collection_name})
+            logger.debug("Using collection name: %s", collection_name)
 
             # SERVICE RESPONSIBILITY: Store documents using pre-created vector store
-            print(f"[VECTOR_SERVICE] Storing documents using existing vector store")
+            logger.debug("Storing documents using existing vector store")
             vector_store = self._get_vector_store(collection_name)
-            document_ids = vector_store.add_documents(documents)
+            document_iter = iter(documents)
+            embedding_iter = iter(embeddings) if embeddings is not None else None
+            document_ids = []
+            while True:
+                batch = list(islice(document_iter, batch_size))
+                if not batch:
+                    break
+                texts, metadatas, ids = self._prepare_batch(batch)
+
+                # SERVICE RESPONSIBILITY: Embed in concurrent batches rather than one request stream
+                if embedding_iter is None:
+                    logger.debug("Generating embeddings for %s documents", len(texts))
+                    batch_embeddings = self.embedding_tool.generate_embeddings_in_batches(
+                        texts
+                    )
+                else:
+                    batch_embeddings = list(islice(embedding_iter, len(batch)))
+
+                if len(batch) < COPY_MIN_ROWS:
+                    vector_store.add_embeddings(
+                        texts, batch_embeddings, metadatas=metadatas, ids=ids
+                    )
+                else:
+                    run_with_connection(
+                        self.engine,
+                        self._copy_embeddings,
+                        collection_name,
+                        texts,
+                        batch_embeddings,
+                        metadatas,
+                        ids,
+                    )
+                document_ids.extend(ids)
+                if on_batch is not None:
+                    on_batch(len(document_ids))
+
+            self._ensure_vector_index(collection_name, vector_store)
+
+            # New content can change the answer to any cached question
+            invalidate_answer_cache(resource_id)
 
             # SERVICE RESPONSIBILITY: Create result with service-level metadata
             enhanced_result = {
                 "success": True,
                 "collection_name": collection_name,
-                "document_count": len(documents),
+                "document_count": len(document_ids),
                 "document_ids": document_ids,
-                "embedding_model": "text-embedding-3-small",
+                "embedding_model": self.embedding_tool.model,
             }
 
-            print(
-                f"[VECTOR_SERVICE] Successfully stored {enhanced_result['document_count']} documents in vector database",
+            logger.info(
+                "Successfully stored %s documents in vector database",
+                enhanced_result["document_count"],
             )
             return enhanced_result
 
         except Exception as e:
-            print(f"[VECTOR_SERVICE] Failed to store documents in vector database: {str(e)}")
+            logger.exception("Failed to store documents in vector database: %s", e)
+            raise RuntimeError(
+                f"[VECTOR_SERVICE] Failed to store documents in vector database: {str(e)}"
+            )
+
+    async def astore_documents(
+        self,
+        documents: List[Document],
+        resource_id: UUID,
+        embeddings: Optional[List[List[float]]] = None,
+        batch_size: int = 1000,
+    ) -> Dict[str, Any]:
+        """
+        Store documents in vector database without blocking the caller's event loop.
+
+        Same batching as store_documents, with embedding requests and inserts awaited.
+
+        Args:
+            documents: List of documents to store
+            resource_id: UUID
+            embeddings: Precomputed embeddings, one per document (generated in
+                concurrent batches if not provided)
+            batch_size: Number of documents embedded and inserted per round
+
+        Returns:
+            Storage result with metadata
+
+        Raises:
+            RuntimeError: If storage operation fails
+        """
+        try:
+            collection_name = self.get_collection_name(resource_id)
+            logger.debug(
+                "Storing %s documents in collection: %s",
+                len(documents),
+                collection_name,
+            )
+
+            vector_store = await asyncio.to_thread(
+                self._get_vector_store, collection_name
+            )
+            document_ids = []
+            async with self.embedding_tool.loop_embeddings() as loop_embeddings:
+                for start in range(0, len(documents), batch_size):
+                    batch = documents[start : start + batch_size]
+                    texts, metadatas, ids = self._prepare_batch(batch)
+
+                    if embeddings is None:
+                        batch_embeddings = (
+                            await self.embedding_tool.agenerate_embeddings_in_batches(
+                                texts, embeddings=loop_embeddings
+                            )
+                        )
+                    else:
+                        batch_embeddings = embeddings[start : start + batch_size]
+
+                    if len(batch) < COPY_MIN_ROWS:
+                        await vector_store.aadd_embeddings(
+                            texts, batch_embeddings, metadatas=metadatas, ids=ids
+                        )
+                    else:
+                        await arun_with_connection(
+                            self.engine,
+                            self._copy_embeddings,
+                            collection_name,
+                            texts,
+                            batch_embeddings,
+                            metadatas,
+                            ids,
+                        )
+                    document_ids.extend(ids)
+
+            await asyncio.to_thread(
+                self._ensure_vector_index, collection_name, vector_store
+            )
+
+            # New content can change the answer to any cached question
+            invalidate_answer_cache(resource_id)
+
+            logger.info(
+                "Successfully stored %s documents in vector database", len(documents)
+            )
+            return {
+                "success": True,
+                "collection_name": collection_name,
+                "document_count": len(documents),
+                "document_ids": document_ids,
+                "embedding_model": self.embedding_tool.model,
+            }
+
+        except Exception as e:
+            logger.exception("Failed to store documents in vector database: %s", e)
             raise RuntimeError(
                 f"[VECTOR_SERVICE] Failed to store documents in vector database: {str(e)}"
             )
@@ -1,4 +1,5 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 from langchain_community.document_loaders import UnstructuredURLLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -10,31 +11,52 @@ from dotenv import load_dotenv
 # Step 1: Load Environment Variables
 load_dotenv()
 
-# Step 2: Load and Split Documents
+# Chunking settings: ~15% overlap keeps context across boundaries without
+# multiplying the number of chunks to embed
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 150
+
+# The collection is kept on disk, so later runs skip loading and embedding the pages
+PERSIST_DIRECTORY = "./chroma_python_docs"
+
+# Step 2: Create Vector Store
+vectorstore = Chroma(
+    collection_name="python_docs",
+    embedding_function=OpenAIEmbeddings(),
+    persist_directory=PERSIST_DIRECTORY,
+)
+
+# Step 3: Load and Split Documents (only when the stored collection is empty)
 urls = [
     "https://docs.python.org/3/tutorial/index.html",
     "https://realpython.com/python-basics/",
     "https://www.learnpython.org/"
 ]
 
-loader = UnstructuredURLLoader(urls=urls)
-docs = loader.load()
+if not vectorstore.get(limit=1)["ids"]:
+    # Fetch and parse the pages concurrently; each URL is a separate network round trip
+    with ThreadPoolExecutor(max_workers=min(8, len(urls))) as executor:
+        docs = [
+            doc
+            for url_docs in executor.map(
+                lambda url: UnstructuredURLLoader(urls=[url]).load(), urls
+            )
+            for doc in url_docs
+        ]
 
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=100,
-    chunk_overlap=50
-)
-doc_splits = text_splitter.split_documents(docs)
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP
+    )
+    doc_splits = text_splitter.split_documents(docs)
 
-# Step 3: Create Vector Store
-vectorstore = Chroma(
-    collection_name="python_docs",
-    embedding_function=OpenAIEmbeddings(),
-)
+    vectorstore.add_documents(doc_splits)
 
-vectorstore.add_documents(doc_splits)
 retriever = vectorstore.as_retriever()
 
+# Created once so every question reuses the same client and its open connections
+llm = ChatOpenAI(model="gpt-4o-mini")
+
 # Step 4: Define Retrieval and Answer Generation Functions
 def retrieve(question: str) -> List[str]:
     # documents = retriever.invoke(question)   # METHOD 1 : Using retriever
@@ -42,7 +64,6 @@ def retrieve(question: str) -> List[str]:
     return [doc.page_content for doc in documents]
 
 def generate_answer(question: str, context: List[str]) -> str:
-    llm = ChatOpenAI(model="gpt-4o-mini")
     context_text = "\n".join(context)
     prompt = f"Context:\n{context_text}\n\nQuestion: {question}\n\n"
     response = llm.invoke(prompt)